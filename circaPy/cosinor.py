@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+import circaPy.preprocessing as prep
+
+
+def _design_matrix(hours, period, n_components):
+    """
+    Cosinor design matrix for a shared set of time points.
+
+    Parameters
+    ----------
+    hours : np.ndarray
+        Time of each sample in hours.
+    period : float
+        Period of the fundamental component in hours.
+    n_components : int
+        Number of harmonics, the k-th has period `period / k`.
+
+    Returns
+    -------
+    np.ndarray
+        Matrix of shape (len(hours), 1 + 2 * n_components) with columns
+        1, cos(k w t), sin(k w t) for each harmonic k.
+    """
+    angle = 2 * np.pi * np.outer(hours, np.arange(1, n_components + 1)) \
+        / period
+    design = np.empty((len(hours), 1 + 2 * n_components))
+    design[:, 0] = 1
+    design[:, 1::2] = np.cos(angle)
+    design[:, 2::2] = np.sin(angle)
+    return design
+
+
+def _solve_cosinor(design, values):
+    """
+    Least squares cosinor fit of every column of `values`.
+
+    Columns without NaNs share the design matrix and are solved together in
+    a single `lstsq` call, columns with NaNs are solved on their own valid
+    rows.
+
+    Parameters
+    ----------
+    design : np.ndarray
+        Design matrix from `_design_matrix`, shape (n_samples, n_params).
+    values : np.ndarray
+        Observations, shape (n_samples, n_columns).
+
+    Returns
+    -------
+    coefs : np.ndarray
+        Fitted coefficients, shape (n_params, n_columns).
+    cov : np.ndarray
+        Covariance of the coefficients, shape (n_columns, n_params,
+        n_params).
+    r2 : np.ndarray
+        Coefficient of determination of each column.
+    """
+    n_params = design.shape[1]
+    n_cols = values.shape[1]
+    coefs = np.full((n_params, n_cols), np.nan)
+    cov = np.full((n_cols, n_params, n_params), np.nan)
+    r2 = np.full(n_cols, np.nan)
+
+    def _fit(x, y, cols):
+        # y is (samples, len(cols)) and every column shares x
+        if len(x) <= n_params:
+            return
+        beta = np.linalg.lstsq(x, y, rcond=None)[0]
+        resid = y - x @ beta
+        rss = (resid * resid).sum(axis=0)
+        tss = ((y - y.mean(axis=0)) ** 2).sum(axis=0)
+        sigma2 = rss / (len(x) - n_params)
+        xtx_inv = np.linalg.pinv(x.T @ x)
+        coefs[:, cols] = beta
+        cov[cols] = sigma2[:, None, None] * xtx_inv
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r2[cols] = 1 - rss / tss
+
+    valid = ~np.isnan(values)
+    complete = np.flatnonzero(valid.all(axis=0))
+    if len(complete):
+        _fit(design, values[:, complete], complete)
+    for col in np.flatnonzero(~valid.all(axis=0)):
+        rows = valid[:, col]
+        _fit(design[rows], values[rows, col][:, None], [col])
+
+    return coefs, cov, r2
+
+
+def _cosinor_parameters(coefs, cov, r2, period, offset=0):
+    """
+    Converts cosinor coefficients to mesor, amplitude and acrophase.
+
+    Standard errors of amplitude and acrophase come from the delta method.
+
+    Parameters
+    ----------
+    coefs, cov, r2
+        Output of `_solve_cosinor`.
+    period : float
+        Period of the fundamental component in hours.
+    offset : float or np.ndarray, optional
+        Clock time in hours at t = 0 for each column, added to the
+        acrophase. Default is 0.
+
+    Returns
+    -------
+    dict
+        Arrays of parameters keyed by output column name.
+    """
+    n_components = (coefs.shape[0] - 1) // 2
+    params = {"Mesor": coefs[0],
+              "Mesor_SE": np.sqrt(cov[:, 0, 0])}
+    for k in range(1, n_components + 1):
+        b_cos, b_sin = coefs[2 * k - 1], coefs[2 * k]
+        v_cc = cov[:, 2 * k - 1, 2 * k - 1]
+        v_ss = cov[:, 2 * k, 2 * k]
+        v_cs = cov[:, 2 * k - 1, 2 * k]
+        amplitude = np.hypot(b_cos, b_sin)
+        # hours per radian for this harmonic
+        scale = period / (2 * np.pi * k)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            amp_var = (b_cos ** 2 * v_cc + b_sin ** 2 * v_ss
+                       + 2 * b_cos * b_sin * v_cs) / amplitude ** 2
+            phase_var = (b_sin ** 2 * v_cc + b_cos ** 2 * v_ss
+                         - 2 * b_cos * b_sin * v_cs) / amplitude ** 4
+        acrophase = (np.arctan2(b_sin, b_cos) * scale + offset) % (period / k)
+        params[f"Amplitude_{k}"] = amplitude
+        params[f"Amplitude_{k}_SE"] = np.sqrt(amp_var)
+        params[f"Acrophase_{k}"] = acrophase
+        params[f"Acrophase_{k}_SE"] = np.sqrt(phase_var) * scale
+    params["R2"] = r2
+    return params
+
+
+@prep.validate_input
+def fit_cosinor(data, period=24, n_components=1, **kwargs):
+    """
+    Fits a cosinor model to every column of a DataFrame.
+
+    The model is y = M + sum_k A_k cos(2 pi k t / period - phi_k), fitted by
+    least squares. The design matrix is built once for the shared time
+    index and all complete columns are solved in one call.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Time-series data. The index represents time, and the columns
+        contain observations.
+    period : float, optional
+        Period of the fundamental component in hours. Default is 24.
+    n_components : int, optional
+        Number of harmonics to fit, the k-th having period `period / k`.
+        Default is 1.
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by column name with columns:
+            - "Mesor", "Mesor_SE" : rhythm adjusted mean and its standard
+              error.
+            - "Amplitude_k", "Amplitude_k_SE" : amplitude of harmonic k and
+              its standard error.
+            - "Acrophase_k", "Acrophase_k_SE" : clock time of the peak of
+              harmonic k in hours after midnight, and its standard error in
+              hours.
+            - "R2" : coefficient of determination.
+
+    Raises
+    ------
+    ValueError
+        If `period` is not positive or `n_components` is less than 1.
+
+    Notes
+    -----
+    - NaN samples are left out of the fit of their column.
+    - Standard errors of amplitude and acrophase use the delta method and
+      are unreliable when the amplitude is close to zero.
+    """
+    if period <= 0 or n_components < 1:
+        raise ValueError(f"period ({period}) must be positive and "
+                         f"n_components ({n_components}) at least 1.")
+
+    # hours since midnight of the first day, so acrophase is clock time
+    hours = (data.index - data.index[0].normalize()).total_seconds() / 3600
+    design = _design_matrix(np.asarray(hours), period, n_components)
+    coefs, cov, r2 = _solve_cosinor(design, data.values.astype(float))
+    params = _cosinor_parameters(coefs, cov, r2, period)
+
+    return pd.DataFrame(params, index=data.columns)
+
+
+@prep.validate_input
+def fit_cosinor_windowed(data, period=24, n_components=1, window="1D",
+                         **kwargs):
+    """
+    Fits a cosinor model to every column in consecutive windows, by default
+    one fit per day.
+
+    All windows have the same sampling grid, so a single design matrix is
+    shared by every window and column and complete windows are solved
+    together in one `lstsq` call.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Evenly sampled time-series data. The index represents time, and the
+        columns contain observations.
+    period : float, optional
+        Period of the fundamental component in hours. Default is 24.
+    n_components : int, optional
+        Number of harmonics to fit. Default is 1.
+    window : str, optional
+        Length of each window as a timedelta string. Default is "1D".
+
+    Returns
+    -------
+    pd.DataFrame
+        The columns of `fit_cosinor`, indexed by subject and window start
+        time.
+
+    Raises
+    ------
+    ValueError
+        If `period` is not positive, `n_components` is less than 1 or the
+        window is longer than the data.
+
+    Notes
+    -----
+    - Windows start at the first timestamp, data after the last complete
+      window are not used.
+    """
+    if period <= 0 or n_components < 1:
+        raise ValueError(f"period ({period}) must be positive and "
+                         f"n_components ({n_components}) at least 1.")
+
+    sample_freq = pd.Timedelta(pd.tseries.frequencies.to_offset(
+        pd.infer_freq(data.index))).total_seconds()
+    window_len = int(round(pd.Timedelta(window).total_seconds()
+                           / sample_freq))
+    n_windows = len(data) // window_len
+    if n_windows < 1:
+        raise ValueError(f"window ({window}) is longer than the data.")
+
+    # windows become extra columns, ordered subject then window
+    n_cols = data.shape[1]
+    values = data.values[:n_windows * window_len].astype(float)
+    values = values.reshape(n_windows, window_len, n_cols).transpose(
+        1, 2, 0).reshape(window_len, -1)
+
+    hours = np.arange(window_len) * sample_freq / 3600
+    design = _design_matrix(hours, period, n_components)
+    coefs, cov, r2 = _solve_cosinor(design, values)
+
+    # shift each window's acrophase to clock time
+    window_starts = pd.DatetimeIndex(
+        data.index[0] + np.arange(n_windows) * pd.Timedelta(window))
+    start_hours = np.asarray(
+        (window_starts - window_starts.normalize()).total_seconds() / 3600)
+    params = _cosinor_parameters(coefs, cov, r2, period,
+                                 offset=np.tile(start_hours, n_cols))
+
+    index = pd.MultiIndex.from_product(
+        [data.columns, window_starts], names=["subject", "window_start"])
+    return pd.DataFrame(params, index=index)
@@ -17,6 +17,85 @@ import circaPy.preprocessing as prep
 # df
 
 
+def _detect_episodes(curr_data):
+    """
+    Finds the activity episodes in a single column, delimited by zeros.
+
+    Parameters
+    ----------
+    curr_data : pd.Series
+        Time-indexed activity data.
+
+    Returns
+    -------
+    pd.Series
+        Index is the start of each episode and value is its duration in
+        seconds. Episodes touching the start or end of the data are dropped.
+    """
+    # Determine the threshold for episode identification
+    zero_data = (curr_data == 0)
+
+    # Filter out consecutive zero episodes (treat them as one episode)
+    # where goes activity to 0
+    episode_ends = zero_data & ~zero_data.shift(1, fill_value=False)
+    # where goes from 0 to activity
+    episode_starts = zero_data & ~zero_data.shift(-1, fill_value=False)
+    # grab the start and end times
+    data_freq = pd.Timedelta(pd.infer_freq(curr_data.index))
+    episode_start_times = curr_data.index[episode_starts] + data_freq
+    episode_end_times = curr_data.index[episode_ends]
+
+    # Create a DataFrame with episodes
+    episode_df = pd.Series(
+        (episode_end_times[1:] - episode_start_times[:-1]).total_seconds(),
+        index=episode_start_times[:-1])
+
+    return episode_df
+
+
+def _episode_gaps(episode_df):
+    # seconds between the end of each episode and the start of the next
+    starts = episode_df.index.values
+    ends = starts + (episode_df.values * 1e9).astype("timedelta64[ns]")
+    return (starts[1:] - ends[:-1]) / np.timedelta64(1, "s"), starts, ends
+
+
+def _merge_bounds(gaps, max_gap):
+    # positions of the first and last episode in each merged episode
+    breaks = np.flatnonzero(gaps > max_gap)
+    first = np.concatenate([[0], breaks + 1])
+    last = np.concatenate([breaks, [len(gaps)]])
+    return first, last
+
+
+def _merge_episodes(episode_df, max_gap):
+    """
+    Merges episodes separated by interruptions of at most `max_gap` seconds.
+
+    Parameters
+    ----------
+    episode_df : pd.Series
+        Index is the start of each episode and value is its duration in
+        seconds, sorted by start time.
+    max_gap : float
+        Longest interruption, in seconds, to merge across.
+
+    Returns
+    -------
+    pd.Series
+        The merged episodes, durations include the merged interruptions.
+    """
+    if episode_df.empty:
+        return episode_df
+    gaps, starts, ends = _episode_gaps(episode_df)
+
+    # a new episode starts after every interruption that is too long
+    first, last = _merge_bounds(gaps, max_gap)
+    durations = (ends[last] - starts[first]) / np.timedelta64(1, "s")
+
+    return pd.Series(durations, index=pd.DatetimeIndex(starts[first]))
+
+
 @prep.validate_input
 def find_episodes(data,
                   subject_no=0,
@@ -72,69 +151,13 @@ def find_episodes(data,
     """
     # select single column
     curr_data = data.iloc[:, subject_no]
-
-    # Determine the threshold for episode identification
-    zero_data = (curr_data == 0)
-    episode_data = curr_data[zero_data]
-
-    # Identify the time differences between consecutive points
-    shifted_index = episode_data.index.to_series().shift(-1)  # Shift index forward
-    episode_durations = (
-        shifted_index - episode_data.index.to_series()
-    ).dropna().dt.total_seconds()
-
-    # Filter out consecutive zero episodes (treat them as one episode)
-    # where goes activity to 0
-    episode_ends = zero_data & ~zero_data.shift(1, fill_value=False)
-    # where goes from 0 to activity
-    episode_starts = zero_data & ~zero_data.shift(-1, fill_value=False)
-    # grab the start and end times
-    data_freq = pd.Timedelta(pd.infer_freq(curr_data.index))
-    episode_start_times = curr_data.index[episode_starts] + data_freq
-    episode_end_times = curr_data.index[episode_ends]
-
-    # Create a DataFrame with episodes
-    episode_df = pd.Series(
-        (episode_end_times[1:] - episode_start_times[:-1]).total_seconds(),
-        index=episode_start_times[:-1])
+    episode_df = _detect_episodes(curr_data)
 
     # Merge episodes based on max_interruption
     if max_interruption != "0s":
         max_interruption_td = pd.Timedelta(max_interruption)
-        merged_episodes = []
-        current_start = None
-        current_end = None
-
-        # go through each start time and duration
-        for start_time, duration in episode_df.items():
-            if current_start is None:
-                current_start = start_time
-                current_duration = duration
-            else:
-                # check what the interruption length is between this and last
-                interruption = (
-                    start_time - (
-                        current_start + pd.Timedelta(
-                            seconds=current_duration)
-                    )
-                ).total_seconds()
-                # if short enough
-                if interruption <= max_interruption_td.total_seconds():
-                    # Merge episodes
-                    current_duration += interruption + duration
-                else:
-                    # save current episode and start new one
-                    merged_episodes.append((current_start, current_duration))
-                    current_start = start_time
-                    current_duration = duration
-
-        # Append the last episode
-        if current_start is not None:
-            merged_episodes.append((current_start, current_duration))
-
-        # Update the episode DataFrame
-        episode_df = pd.Series(
-            {start: duration for start, duration in merged_episodes})
+        episode_df = _merge_episodes(
+            episode_df, max_interruption_td.total_seconds())
 
     # Finally, filter episodes by min_length
     min_length_td = pd.Timedelta(min_length)
@@ -143,6 +166,80 @@ def find_episodes(data,
     return episode_df
 
 
+@prep.validate_input
+def episode_parameter_sweep(data,
+                            subject_no=0,
+                            min_lengths=("1s",),
+                            max_interruptions=("0s",)):
+    """
+    Episode counts and total durations of `find_episodes` for every
+    combination of `min_length` and `max_interruption`.
+
+    Episodes are detected once. Merging by interruption length is nested,
+    a larger `max_interruption` only joins more episodes together, so each
+    threshold is resolved from the array of gaps between the detected
+    episodes. Filtering by `min_length` is monotone, so all minimum lengths
+    are answered with one sort and a reverse cumulative sum.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        The activity data, where each column represents a subject's activity
+        over time, and the index is a time-based index.
+    subject_no : int, optional
+        The column index of the subject to analyze. Default is 0.
+    min_lengths : list of str or pandas.Timedelta, optional
+        The minimum episode durations to test. Default is ("1s",).
+    max_interruptions : list of str or pandas.Timedelta, optional
+        The maximum interruptions to test. Default is ("0s",).
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by "max_interruption" and "min_length" as given, with
+        columns "count" (number of episodes) and "total" (summed duration in
+        seconds), matching what `find_episodes` returns for each pair.
+
+    Examples
+    --------
+    >>> episode_parameter_sweep(data, min_lengths=["10s", "1min"],
+    ...                         max_interruptions=["0s", "30s", "1min"])
+    """
+    curr_data = data.iloc[:, subject_no]
+    episode_df = _detect_episodes(curr_data)
+    gaps, starts, ends = _episode_gaps(episode_df)
+    min_length_secs = np.array(
+        [pd.Timedelta(x).total_seconds() for x in min_lengths])
+
+    results = []
+    for max_interruption in max_interruptions:
+        max_gap = pd.Timedelta(max_interruption).total_seconds()
+
+        # durations of the merged episodes at this threshold, sorted
+        durations = np.array([])
+        if not episode_df.empty:
+            first, last = _merge_bounds(gaps, max_gap)
+            durations = np.sort(
+                (ends[last] - starts[first]) / np.timedelta64(1, "s"))
+
+        # count and total of everything at or above each min_length
+        position = np.searchsorted(durations, min_length_secs, side="left")
+        suffix_totals = np.concatenate(
+            [np.cumsum(durations[::-1])[::-1], [0]])
+        results.append(pd.DataFrame({
+            "count": len(durations) - position,
+            "total": suffix_totals[position],
+        }))
+
+    index = pd.MultiIndex.from_product(
+        [list(max_interruptions), list(min_lengths)],
+        names=["max_interruption", "min_length"])
+    sweep = pd.concat(results, ignore_index=True)
+    sweep.index = index
+
+    return sweep
+
+
 def _episode_finder(data,
                     inactive_episodes=False,
                     allow_interruptions=False,
@@ -359,6 +456,651 @@ def check_episode_max(data,
     if any(max_values > comparison):
         raise ValueError("Max episode longer than %s" % max_time)
 
+
+def _run_bounds(mask):
+    """
+    Finds the runs of True values in each column of a boolean array.
+
+    Parameters
+    ----------
+    mask : np.ndarray
+        Boolean array of shape (n_samples,) or (n_samples, n_columns).
+
+    Returns
+    -------
+    tuple of np.ndarray
+        Column number, start position and end position (exclusive) of every
+        run, ordered by column and then by time.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if mask.ndim == 1:
+        mask = mask[:, None]
+
+    # pad with False so every run has a rising and a falling edge
+    padded = np.zeros((mask.shape[0] + 2, mask.shape[1]), dtype=np.int8)
+    padded[1:-1] = mask
+    edges = np.diff(padded, axis=0)
+
+    # transpose so the edges come out ordered by column then time
+    cols, starts = np.nonzero(edges.T == 1)
+    _, ends = np.nonzero(edges.T == -1)
+
+    return cols, starts, ends
+
+
+def _hysteresis_state(values, low=0, high=None, min_epochs=1):
+    """
+    Vectorised two-level state detection for every column at once.
+
+    A column becomes inactive at the start of a run of at least `min_epochs`
+    values at or below `low` and stays inactive until a value rises above
+    `high`. Values in between the two levels keep the previous state.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Activity values of shape (n_samples, n_columns).
+    low : float, optional
+        Values at or below this level count as inactive. Default is 0.
+    high : float, optional
+        Values above this level end inactivity, defaults to `low`.
+    min_epochs : int, optional
+        Number of consecutive low epochs needed to become inactive.
+        Default is 1.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array, True where the column is inactive.
+    """
+    if high is None:
+        high = low
+    if high < low:
+        raise ValueError(f"high ({high}) must not be less than low ({low}).")
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+
+    # mark entries into inactivity at the start of long enough low runs
+    markers = np.zeros(values.shape, dtype=np.int8)
+    cols, starts, ends = _run_bounds(values <= low)
+    long_runs = (ends - starts) >= min_epochs
+    markers[starts[long_runs], cols[long_runs]] = 1
+
+    # and exits wherever the activity goes above the high level
+    markers[values > high] = -1
+
+    # carry the last marker forward down each column
+    rows = np.arange(values.shape[0])[:, None]
+    last_marker = np.where(markers != 0, rows, 0)
+    np.maximum.accumulate(last_marker, axis=0, out=last_marker)
+    state = np.take_along_axis(markers, last_marker, axis=0)
+
+    return state == 1
+
+
+def episodes_from_mask(mask, bounded=True):
+    """
+    Converts a boolean state mask into episodes for every column.
+
+    Parameters
+    ----------
+    mask : pd.DataFrame
+        Time-indexed boolean DataFrame, True where a column is in the state
+        of interest.
+    bounded : bool, optional
+        If True, drops episodes touching the start or end of the recording
+        as their true length is unknown, as `find_episodes` does.
+        Default is True.
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataframe with the same columns as `mask`, index indicates the start
+        of an episode and value indicates duration in seconds, in the same
+        format as `episode_find_df`.
+    """
+    freq = pd.Timedelta(pd.tseries.frequencies.to_offset(
+        pd.infer_freq(mask.index))).total_seconds()
+    cols, starts, ends = _run_bounds(mask.values)
+    if bounded:
+        inside = (starts > 0) & (ends < len(mask))
+        cols, starts, ends = cols[inside], starts[inside], ends[inside]
+    durations = (ends - starts) * freq
+
+    # split the flat run arrays back into one Series per column
+    splits = np.searchsorted(cols, np.arange(1, mask.shape[1]))
+    episode_series_list = [
+        pd.Series(col_durations, index=mask.index[col_starts], name=col)
+        for col, col_starts, col_durations in zip(
+            mask.columns,
+            np.split(starts, splits),
+            np.split(durations, splits))]
+
+    return pd.concat(episode_series_list, axis=1)
+
+
+@prep.validate_input
+def find_episodes_threshold(data,
+                            low=0,
+                            high=None,
+                            min_epochs=1,
+                            inactive_episodes=False,
+                            min_length="1s"):
+    """
+    Identifies episodes in every column using threshold or hysteresis
+    rules instead of equality with zero.
+
+    With only `low` given, values at or below `low` are inactive and values
+    above it are active. Giving a `high` level as well adds hysteresis, a
+    column becomes inactive when it stays at or below `low` for at least
+    `min_epochs` epochs and only becomes active again once it rises above
+    `high`.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Time-indexed activity data with a column for each subject.
+    low : float, optional
+        Activity at or below this level counts as inactive. Default is 0,
+        which reproduces the zero/non-zero split of `find_episodes`.
+    high : float, optional
+        Activity must exceed this level to end an inactive episode.
+        Defaults to `low`, giving a single threshold.
+    min_epochs : int, optional
+        Number of consecutive epochs at or below `low` needed to become
+        inactive. Default is 1.
+    inactive_episodes : bool, optional
+        If False, returns activity episodes, if True returns inactive
+        episodes. Default is False.
+    min_length : str or pandas.Timedelta, optional
+        The minimum duration for an episode to be included in the results.
+        Default is "1s".
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataframe with the same columns as `data`, index indicates the start
+        of an episode and value indicates duration in seconds.
+
+    Examples
+    --------
+    >>> find_episodes_threshold(data, low=2, high=10, min_epochs=3,
+    ...                         inactive_episodes=True)
+    """
+    inactive = _hysteresis_state(
+        data.values, low=low, high=high, min_epochs=min_epochs)
+    if not inactive_episodes:
+        inactive = ~inactive
+    mask = pd.DataFrame(inactive, index=data.index, columns=data.columns)
+    episode_df = episodes_from_mask(mask)
+
+    # filter episodes by min_length
+    min_length_td = pd.Timedelta(min_length)
+    episode_df = episode_df.where(
+        episode_df >= min_length_td.total_seconds())
+
+    return episode_df.dropna(how="all")
+
+
+def light_phase_windows(light_data, light_val=150):
+    """
+    Splits a light recording into its light and dark phases.
+
+    Parameters
+    ----------
+    light_data : pd.Series
+        Time-indexed light levels.
+    light_val : int, optional
+        The threshold at or above which the light is considered "on".
+        Default is 150.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per phase with columns "start" and "end" (timestamps, end
+        exclusive), "day" (whole days since the first midnight) and
+        "phase" (1 for light, 0 for dark).
+    """
+    light_on = (light_data.values >= light_val)
+    index = light_data.index
+    freq = pd.Timedelta(pd.tseries.frequencies.to_offset(
+        pd.infer_freq(index)))
+
+    # a phase ends where the other one starts
+    _, on_starts, on_ends = _run_bounds(light_on)
+    _, off_starts, off_ends = _run_bounds(~light_on)
+    starts = np.concatenate([on_starts, off_starts])
+    ends = np.concatenate([on_ends, off_ends])
+    phase = np.concatenate([np.ones(len(on_starts), dtype=int),
+                            np.zeros(len(off_starts), dtype=int)])
+    order = np.argsort(starts, kind="stable")
+    starts, ends, phase = starts[order], ends[order], phase[order]
+
+    start_times = index[starts]
+    end_times = index[ends - 1] + freq
+    day = (start_times - index[0].normalize()) // pd.Timedelta("1D")
+
+    return pd.DataFrame({"start": start_times,
+                         "end": end_times,
+                         "day": np.asarray(day),
+                         "phase": phase})
+
+
+class EpisodeIndex:
+    """
+    Sorted interval index over the episodes of a single subject.
+
+    Stores episode start and end times as sorted arrays so time-window
+    queries are answered by binary search rather than by boolean masks
+    over the whole episode Series. Episodes are assumed not to overlap,
+    which holds for the output of `find_episodes`, so the end times are
+    sorted as well.
+
+    Parameters
+    ----------
+    episodes : pd.Series
+        Episodes as returned by `find_episodes`, index is the start time and
+        values are the durations in seconds.
+
+    Examples
+    --------
+    >>> episodes = find_episodes(data, subject_no=0)
+    >>> ep_index = EpisodeIndex(episodes)
+    >>> ep_index.overlapping("2024-01-01 18:00", "2024-01-02 06:00")
+    >>> ep_index.count(day_starts, day_ends, how="start")
+    """
+
+    def __init__(self, episodes):
+        episodes = episodes.dropna().sort_index()
+        self.name = episodes.name
+        self.starts = episodes.index.values.astype("datetime64[ns]")
+        self.durations = episodes.values.astype(float)
+        self.ends = self.starts + (
+            self.durations * 1e9).astype("timedelta64[ns]")
+
+        # cumulative durations to answer sum queries without a loop
+        self._cum_durations = np.concatenate([[0], np.cumsum(self.durations)])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __repr__(self):
+        return f"EpisodeIndex(name={self.name!r}, episodes={len(self)})"
+
+    @staticmethod
+    def _as_times(times):
+        return np.atleast_1d(
+            pd.to_datetime(times)).astype("datetime64[ns]")
+
+    def _bounds(self, start, end, how="overlap"):
+        # positions of the first and one past the last matching episode
+        start = self._as_times(start)
+        end = self._as_times(end)
+        if how == "overlap":
+            first = np.searchsorted(self.ends, start, side="right")
+        elif how == "start":
+            first = np.searchsorted(self.starts, start, side="left")
+        else:
+            raise ValueError("how must be 'overlap' or 'start'")
+        last = np.searchsorted(self.starts, end, side="left")
+        last = np.maximum(last, first)
+        return start, end, first, last
+
+    def to_series(self):
+        """
+        Returns the episodes in the same format as `find_episodes`.
+        """
+        return pd.Series(self.durations,
+                         index=pd.DatetimeIndex(self.starts),
+                         name=self.name)
+
+    def overlapping(self, start, end):
+        """
+        Episodes that overlap the window from `start` to `end`.
+
+        Parameters
+        ----------
+        start, end : str or pd.Timestamp
+            Window boundaries, end exclusive.
+
+        Returns
+        -------
+        pd.Series
+            The overlapping episodes with their full durations.
+        """
+        _, _, first, last = self._bounds(start, end)
+        return self.to_series().iloc[first[0]:last[0]]
+
+    def started_between(self, start, end):
+        """
+        Episodes that start within the window from `start` to `end`.
+
+        Parameters
+        ----------
+        start, end : str or pd.Timestamp
+            Window boundaries, end exclusive.
+
+        Returns
+        -------
+        pd.Series
+            The episodes starting in the window.
+        """
+        _, _, first, last = self._bounds(start, end, how="start")
+        return self.to_series().iloc[first[0]:last[0]]
+
+    def count(self, starts, ends, how="overlap"):
+        """
+        Number of episodes in each of a list of windows.
+
+        Parameters
+        ----------
+        starts, ends : array-like
+            Window start and end times, ends exclusive.
+        how : str, optional
+            "overlap" counts episodes overlapping the window, "start" counts
+            episodes starting within it. Default is "overlap".
+
+        Returns
+        -------
+        np.ndarray
+            Episode count for each window.
+        """
+        _, _, first, last = self._bounds(starts, ends, how=how)
+        return last - first
+
+    def total(self, starts, ends):
+        """
+        Total episode time inside each of a list of windows.
+
+        Episodes crossing a window boundary only contribute the part that
+        falls within the window.
+
+        Parameters
+        ----------
+        starts, ends : array-like
+            Window start and end times, ends exclusive.
+
+        Returns
+        -------
+        np.ndarray
+            Seconds of episode time in each window.
+        """
+        starts, ends, first, last = self._bounds(starts, ends)
+        if len(self) == 0:
+            return np.zeros(len(starts))
+        total = self._cum_durations[last] - self._cum_durations[first]
+
+        # trim the episodes that cross the window edges
+        has_episodes = last > first
+        first_start = self.starts[np.minimum(first, len(self) - 1)]
+        last_end = self.ends[np.maximum(last - 1, 0)]
+        head = np.maximum(starts - first_start, np.timedelta64(0, "ns"))
+        tail = np.maximum(last_end - ends, np.timedelta64(0, "ns"))
+        trim = (head + tail) / np.timedelta64(1, "s")
+
+        return np.where(has_episodes, total - trim, 0.0)
+
+    def by_day(self, origin=None):
+        """
+        Episode count and total time for every day of the recording.
+
+        Parameters
+        ----------
+        origin : str or pd.Timestamp, optional
+            Start of day 0, defaults to midnight before the first episode.
+
+        Returns
+        -------
+        pd.DataFrame
+            Indexed by day number with columns "count" and "total" (seconds),
+            episodes are split at midnight for the totals.
+        """
+        if len(self) == 0:
+            return pd.DataFrame(columns=["count", "total"])
+        if origin is None:
+            origin = pd.Timestamp(self.starts[0]).normalize()
+        origin = pd.Timestamp(origin)
+        n_days = int((pd.Timestamp(self.ends[-1]) - origin) //
+                     pd.Timedelta("1D")) + 1
+        day_starts = pd.date_range(origin, periods=n_days, freq="D")
+        day_ends = day_starts + pd.Timedelta("1D")
+
+        return pd.DataFrame(
+            {"count": self.count(day_starts, day_ends, how="start"),
+             "total": self.total(day_starts, day_ends)},
+            index=pd.Index(np.arange(n_days), name="day"))
+
+    def by_phase(self, light_data, light_val=150):
+        """
+        Episode count and total time for every light and dark phase.
+
+        Parameters
+        ----------
+        light_data : pd.Series
+            Time-indexed light levels.
+        light_val : int, optional
+            The threshold at or above which the light is considered "on".
+            Default is 150.
+
+        Returns
+        -------
+        pd.DataFrame
+            The phases from `light_phase_windows` with extra columns "count"
+            (episodes starting in the phase) and "total" (seconds of episode
+            time within the phase).
+        """
+        windows = light_phase_windows(light_data, light_val=light_val)
+        windows["count"] = self.count(
+            windows["start"], windows["end"], how="start")
+        windows["total"] = self.total(windows["start"], windows["end"])
+        return windows
+
+
+def _stack_episodes(episodes, LDR=None):
+    """
+    Flattens a ragged episode DataFrame into aligned arrays.
+
+    Parameters
+    ----------
+    episodes : pd.DataFrame or pd.Series
+        Episodes in the `episode_find_df` or `find_episodes` format.
+    LDR : int, optional
+        Column number of light data to drop before stacking.
+
+    Returns
+    -------
+    tuple
+        Column codes, start times, durations in seconds, and the column
+        labels the codes refer to.
+    """
+    if isinstance(episodes, pd.Series):
+        episodes = episodes.to_frame()
+    if LDR is not None:
+        episodes = episodes.drop(episodes.columns[LDR], axis=1)
+
+    values = episodes.values.astype(float)
+    rows, cols = np.nonzero(~np.isnan(values))
+    starts = episodes.index.values[rows].astype("datetime64[ns]")
+
+    return cols, starts, values[rows, cols], episodes.columns
+
+
+def _light_phase_at(light_data, times, light_val=150):
+    # light state at each time, taken from the last light sample before it
+    positions = np.searchsorted(
+        light_data.index.values, times, side="right") - 1
+    light_on = light_data.values[np.clip(positions, 0, None)] >= light_val
+    return light_on.astype(int)
+
+
+def episode_summary(episodes,
+                    light_data=None,
+                    light_val=150,
+                    LDR=None):
+    """
+    Summary statistics of episodes per subject, day and light phase.
+
+    Calculates bout count, mean, median and longest duration, total time and
+    fragmentation index for every subject in a single grouped pass. Each
+    episode is assigned to the day and light phase in which it starts.
+
+    Parameters
+    ----------
+    episodes : pd.DataFrame or pd.Series
+        Episodes in the `episode_find_df` or `find_episodes` format, index is
+        the start time and values are durations in seconds.
+    light_data : pd.Series, optional
+        Time-indexed light levels used to split episodes into light and dark
+        phases. Episodes starting before the first light sample have no
+        known phase and are left out. If not given, episodes are only split
+        by day.
+    light_val : int, optional
+        The threshold at or above which the light is considered "on".
+        Default is 150.
+    LDR : int, optional
+        Column number of the light data to drop from `episodes`, e.g. -1 for
+        the output of `episode_find_df`. Default is None.
+
+    Returns
+    -------
+    pd.DataFrame
+        Tidy table with a row for each subject, day and phase containing
+        columns "count", "mean", "median", "max", "total" (seconds) and
+        "fragmentation" (bouts per hour of episode time).
+    """
+    cols, starts, durations, labels = _stack_episodes(episodes, LDR=LDR)
+
+    # integer day and phase keys for every episode
+    if light_data is not None:
+        covered = starts >= light_data.index[0].to_datetime64()
+        cols, starts, durations = \
+            cols[covered], starts[covered], durations[covered]
+        origin = light_data.index[0].normalize()
+        phase = _light_phase_at(light_data, starts, light_val=light_val)
+    else:
+        # any origin will do when there are no episodes
+        origin = pd.Timestamp(starts.min()).normalize() if len(starts) \
+            else pd.Timestamp(0)
+        phase = np.zeros(len(starts), dtype=int)
+    day = ((starts - origin.to_datetime64()) //
+           np.timedelta64(1, "D")).astype(int)
+    n_days = day.max() + 1 if len(day) else 0
+    key = (cols * n_days + day) * 2 + phase
+
+    # sort once by group then duration so every statistic is a slice
+    order = np.lexsort((durations, key))
+    key, durations = key[order], durations[order]
+    groups, first, count = np.unique(
+        key, return_index=True, return_counts=True)
+    last = first + count - 1
+
+    total = np.add.reduceat(durations, first) if len(first) else \
+        np.zeros(0)
+    median = (durations[first + (count - 1) // 2] +
+              durations[first + count // 2]) / 2
+
+    summary = pd.DataFrame({
+        "subject": labels[groups // 2 // max(n_days, 1)],
+        "day": groups // 2 % max(n_days, 1),
+        "phase": np.where(groups % 2, "light", "dark"),
+        "count": count,
+        "mean": total / count,
+        "median": median,
+        "max": durations[last],
+        "total": total,
+        "fragmentation": count / (total / 3600),
+    })
+    if light_data is None:
+        summary = summary.drop("phase", axis=1)
+
+    return summary
+
+
+def bout_survival(episodes, LDR=None):
+    """
+    Survival and hazard curves of bout durations for every subject.
+
+    For each subject and observed bout duration d, gives the number of bouts
+    still running at d, the fraction surviving beyond d and the hazard, the
+    probability that a bout which has lasted d ends there.
+
+    Parameters
+    ----------
+    episodes : pd.DataFrame or pd.Series
+        Episodes in the `episode_find_df` or `find_episodes` format, index is
+        the start time and values are durations in seconds.
+    LDR : int, optional
+        Column number of the light data to drop from `episodes`.
+        Default is None.
+
+    Returns
+    -------
+    pd.DataFrame
+        Tidy table with columns "subject", "duration" (seconds), "n_bouts"
+        (bouts ending at that duration), "at_risk" (bouts lasting at least
+        that long), "survival" and "hazard".
+    """
+    cols, _, durations, labels = _stack_episodes(episodes, LDR=LDR)
+
+    # count every distinct duration for every subject in one go
+    pairs, n_bouts = np.unique(
+        np.column_stack([cols, durations]), axis=0, return_counts=True)
+    subject = pairs[:, 0].astype(int)
+    subject_totals = np.bincount(cols, minlength=len(labels))
+    previous_totals = np.concatenate([[0], np.cumsum(subject_totals)])
+
+    # bouts already ended before each duration, counted within the subject
+    ended_before = np.cumsum(n_bouts) - n_bouts - previous_totals[subject]
+    total = subject_totals[subject]
+    at_risk = total - ended_before
+
+    return pd.DataFrame({
+        "subject": labels[subject],
+        "duration": pairs[:, 1],
+        "n_bouts": n_bouts,
+        "at_risk": at_risk,
+        "survival": (at_risk - n_bouts) / total,
+        "hazard": n_bouts / at_risk,
+    })
+
+
+def transition_probabilities(rest_episodes, active_episodes, LDR=None):
+    """
+    Rest to activity (kRA) and activity to rest (kAR) transition
+    probabilities as a function of bout length.
+
+    kRA at a given duration is the probability that a rest bout which has
+    lasted that long ends there, the hazard of the rest bout survival
+    curve, and kAR is the same for activity bouts.
+
+    Parameters
+    ----------
+    rest_episodes : pd.DataFrame or pd.Series
+        Rest episodes, e.g. from `find_episodes_threshold` with
+        `inactive_episodes=True`.
+    active_episodes : pd.DataFrame or pd.Series
+        Activity episodes, e.g. from `find_episodes`.
+    LDR : int, optional
+        Column number of the light data to drop from both episode frames.
+        Default is None.
+
+    Returns
+    -------
+    pd.DataFrame
+        The `bout_survival` tables for both bout types stacked with a
+        "transition" column ("kRA" or "kAR"), the hazard column is named
+        "probability".
+    """
+    tables = []
+    for label, episodes in (("kRA", rest_episodes),
+                            ("kAR", active_episodes)):
+        table = bout_survival(episodes, LDR=LDR)
+        table.insert(0, "transition", label)
+        tables.append(table.rename(columns={"hazard": "probability"}))
+
+    return pd.concat(tables, ignore_index=True)
+
 # Functions to plot histogram of data
 
 
@@ -0,0 +1,273 @@
+import numpy as np
+import pandas as pd
+import circaPy.preprocessing as prep
+
+
+def _logsumexp(x, axis):
+    """
+    Numerically stable log(sum(exp(x))) along an axis.
+    """
+    x_max = np.max(x, axis=axis, keepdims=True)
+    x_max = np.where(np.isfinite(x_max), x_max, 0)
+    out = np.log(np.sum(np.exp(x - x_max), axis=axis, keepdims=True))
+    return np.squeeze(out + x_max, axis=axis)
+
+
+def _log_emissions(x, means, variances):
+    """
+    Gaussian log likelihood of every observation under every state.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Observations of shape (n_epochs, n_subjects), NaN where missing.
+    means, variances : np.ndarray
+        State parameters of shape (n_subjects, n_states).
+
+    Returns
+    -------
+    np.ndarray
+        Log likelihoods of shape (n_epochs, n_subjects, n_states), 0 for
+        missing observations so they do not favour any state.
+    """
+    diff = x[..., None] - means
+    log_b = -0.5 * (np.log(2 * np.pi * variances) + diff * diff / variances)
+    return np.where(np.isnan(log_b), 0, log_b)
+
+
+def _forward_backward(log_start, log_trans, log_b):
+    """
+    Log-space forward-backward pass for every subject at once.
+
+    Parameters
+    ----------
+    log_start : np.ndarray
+        Log initial state probabilities, shape (n_subjects, n_states).
+    log_trans : np.ndarray
+        Log transition matrices, shape (n_subjects, n_states, n_states),
+        from state along axis 1 and to state along axis 2.
+    log_b : np.ndarray
+        Log emission likelihoods from `_log_emissions`.
+
+    Returns
+    -------
+    log_alpha, log_beta : np.ndarray
+        Forward and backward variables, shape (n_epochs, n_subjects,
+        n_states).
+    log_likelihood : np.ndarray
+        Log likelihood of each subject.
+    """
+    n_epochs = len(log_b)
+    log_alpha = np.empty_like(log_b)
+    log_beta = np.zeros_like(log_b)
+
+    log_alpha[0] = log_start + log_b[0]
+    for t in range(1, n_epochs):
+        log_alpha[t] = _logsumexp(
+            log_alpha[t - 1][:, :, None] + log_trans, axis=1) + log_b[t]
+    for t in range(n_epochs - 2, -1, -1):
+        log_beta[t] = _logsumexp(
+            log_trans + (log_b[t + 1] + log_beta[t + 1])[:, None, :], axis=2)
+
+    return log_alpha, log_beta, _logsumexp(log_alpha[-1], axis=1)
+
+
+def _expected_transitions(log_alpha, log_beta, log_trans, log_b,
+                          log_likelihood, chunk=4096):
+    """
+    Expected number of transitions between each pair of states, summed
+    over time in chunks to bound memory.
+    """
+    total = np.zeros(log_trans.shape)
+    for start in range(0, len(log_b) - 1, chunk):
+        stop = min(start + chunk, len(log_b) - 1)
+        log_xi = log_alpha[start:stop, :, :, None] + log_trans[None] + \
+            (log_b[start + 1:stop + 1] +
+             log_beta[start + 1:stop + 1])[:, :, None, :] - \
+            log_likelihood[None, :, None, None]
+        total += np.exp(log_xi).sum(axis=0)
+    return total
+
+
+def _viterbi(log_start, log_trans, log_b):
+    """
+    Most likely state path of every subject.
+
+    Returns
+    -------
+    np.ndarray
+        States of shape (n_epochs, n_subjects).
+    """
+    n_epochs, n_subjects, n_states = log_b.shape
+    back = np.empty((n_epochs, n_subjects, n_states), dtype=np.int8)
+    delta = log_start + log_b[0]
+    for t in range(1, n_epochs):
+        scores = delta[:, :, None] + log_trans
+        back[t] = scores.argmax(axis=1)
+        delta = scores.max(axis=1) + log_b[t]
+
+    path = np.empty((n_epochs, n_subjects), dtype=int)
+    path[-1] = delta.argmax(axis=1)
+    subjects = np.arange(n_subjects)
+    for t in range(n_epochs - 1, 0, -1):
+        path[t - 1] = back[t, subjects, path[t]]
+    return path
+
+
+def _fit(x, n_states, n_iter, tol, min_variance=1e-3):
+    """
+    Baum-Welch fit of a Gaussian HMM to every column of `x` together.
+
+    Returns
+    -------
+    dict
+        Log start probabilities, log transition matrices, means and
+        variances, with states ordered by increasing mean.
+    """
+    n_subjects = x.shape[1]
+
+    # start from evenly spaced quantiles of each subject
+    quantiles = np.linspace(0.1, 0.9, n_states)
+    means = np.nanquantile(x, quantiles, axis=0).T
+    means = means + np.arange(n_states) * 1e-3
+    variances = np.tile(np.nanvar(x, axis=0)[:, None], (1, n_states))
+    variances = np.maximum(variances, min_variance)
+    trans = np.full((n_subjects, n_states, n_states),
+                    0.1 / max(n_states - 1, 1))
+    trans[:, np.arange(n_states), np.arange(n_states)] = 0.9
+    if n_states == 1:
+        trans[:] = 1
+    log_start = np.full((n_subjects, n_states), -np.log(n_states))
+    log_trans = np.log(trans)
+
+    valid = ~np.isnan(x)
+    x_filled = np.where(valid, x, 0)
+    previous = np.full(n_subjects, -np.inf)
+    for _ in range(n_iter):
+        log_b = _log_emissions(x, means, variances)
+        log_alpha, log_beta, log_likelihood = _forward_backward(
+            log_start, log_trans, log_b)
+        if np.all(log_likelihood - previous < tol):
+            break
+        previous = log_likelihood
+
+        # E step
+        gamma = np.exp(log_alpha + log_beta - log_likelihood[None, :, None])
+        xi = _expected_transitions(log_alpha, log_beta, log_trans, log_b,
+                                   log_likelihood)
+
+        # M step, missing observations only inform the transitions
+        weights = gamma * valid[..., None]
+        occupancy = np.maximum(weights.sum(axis=0), 1e-12)
+        means = (weights * x_filled[..., None]).sum(axis=0) / occupancy
+        diff = x_filled[..., None] - means
+        variances = np.maximum(
+            (weights * diff * diff).sum(axis=0) / occupancy, min_variance)
+        log_start = np.log(np.maximum(gamma[0], 1e-300))
+        log_trans = np.log(np.maximum(
+            xi / xi.sum(axis=2, keepdims=True), 1e-300))
+
+    # order states by mean so state 0 is always the quietest
+    order = np.argsort(means, axis=1)
+    rows = np.arange(n_subjects)[:, None]
+    return {"log_start": log_start[rows, order],
+            "log_trans": log_trans[rows[:, :, None], order[:, :, None],
+                                   order[:, None, :]],
+            "means": means[rows, order],
+            "variances": variances[rows, order],
+            "log_likelihood": previous}
+
+
+@prep.validate_input
+def hmm_states(data, n_states=2, n_iter=50, tol=1e-4, **kwargs):
+    """
+    Segments activity into rest and activity states with a hidden Markov
+    model fitted to every subject.
+
+    A Gaussian HMM on log(1 + counts) is fitted to each column by
+    expectation maximisation. The forward-backward and Viterbi passes run
+    in log space on all columns at once, so subjects sharing the same
+    recording length are fitted together.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Activity counts, one column per subject. Light data should be
+        removed first.
+    n_states : int, optional
+        Number of hidden states, 2 for rest/active or 3 to separate quiet
+        wake. Default is 2.
+    n_iter : int, optional
+        Maximum number of EM iterations. Default is 50.
+    tol : float, optional
+        EM stops once no subject's log likelihood improves by more than
+        this. Default is 1e-4.
+
+    Returns
+    -------
+    dict
+        A dictionary with the following keys:
+            - "States" : pd.DataFrame
+                Viterbi state of every epoch and subject, 0 is the state
+                with the lowest mean activity (rest).
+            - "Posterior" : pd.DataFrame
+                Posterior probability of each state, columns indexed by
+                subject and state.
+            - "Means", "Variances" : pd.DataFrame
+                Emission parameters on the log(1 + counts) scale, subject by
+                state.
+            - "Transition" : pd.DataFrame
+                Transition probabilities indexed by subject and from state,
+                one column per to state.
+            - "Log_likelihood" : pd.Series
+                Log likelihood of each subject.
+
+    Raises
+    ------
+    ValueError
+        If `n_states` is less than 1.
+
+    Notes
+    -----
+    - NaN epochs are uninformative, their state follows from the
+      neighbouring epochs.
+    - The rest state plugs into the episode and sleep summaries, e.g.
+      `episodes.episodes_from_mask(result["States"] == 0)` or a scored
+      frame `(result["States"] == 0).astype(int)` with the light data added
+      for `sleep_process.sleep_summary`.
+
+    Examples
+    --------
+    >>> result = hmm_states(data.iloc[:, :-1], n_states=3)
+    >>> rest = result["States"] == 0
+    """
+    if n_states < 1:
+        raise ValueError(f"n_states ({n_states}) must be at least 1.")
+
+    x = np.log1p(np.clip(data.values.astype(float), 0, None))
+    params = _fit(x, n_states, n_iter, tol)
+
+    log_b = _log_emissions(x, params["means"], params["variances"])
+    log_alpha, log_beta, log_likelihood = _forward_backward(
+        params["log_start"], params["log_trans"], log_b)
+    posterior = np.exp(
+        log_alpha + log_beta - log_likelihood[None, :, None])
+    path = _viterbi(params["log_start"], params["log_trans"], log_b)
+
+    states = pd.RangeIndex(n_states, name="state")
+    subjects = data.columns
+    return {
+        "States": pd.DataFrame(path, index=data.index, columns=subjects),
+        "Posterior": pd.DataFrame(
+            posterior.reshape(len(data), -1), index=data.index,
+            columns=pd.MultiIndex.from_product([subjects, states])),
+        "Means": pd.DataFrame(params["means"], index=subjects,
+                              columns=states),
+        "Variances": pd.DataFrame(params["variances"], index=subjects,
+                                  columns=states),
+        "Transition": pd.DataFrame(
+            np.exp(params["log_trans"]).reshape(-1, n_states),
+            index=pd.MultiIndex.from_product([subjects, states]),
+            columns=states),
+        "Log_likelihood": pd.Series(log_likelihood, index=subjects),
+    }
@@ -1,14 +1,134 @@
 import re
+import os
 import pdb
+import copy
+import pickle
+import hashlib
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import wraps
 import pandas as pd
 import numpy as np
 from astropy.timeseries import LombScargle
+from scipy.stats import chi2
 import circaPy.activity as act
 import circaPy.preprocessing as prep
 
 
+# periodogram result cache, disabled until enable_cache is called
+_CACHE = {"maxsize": 0, "directory": None, "entries": OrderedDict()}
+
+
+def enable_cache(maxsize=32, directory=None):
+    """
+    Turns on caching of periodogram results.
+
+    Results are keyed by a hash of the data values, index and column names
+    together with the function name and its arguments, so repeated calls on
+    the same recording skip the spectral calculation.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Number of results kept in memory, the least recently used result is
+        dropped first. Default is 32.
+    directory : str, optional
+        If given, results are also pickled to this directory and reused
+        across sessions. Default is None.
+    """
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    _CACHE["maxsize"] = maxsize
+    _CACHE["directory"] = directory
+    while len(_CACHE["entries"]) > maxsize:
+        _CACHE["entries"].popitem(last=False)
+
+
+def disable_cache():
+    """
+    Turns off caching of periodogram results and empties the in-memory
+    cache. Files written to a cache directory are left in place.
+    """
+    _CACHE["maxsize"] = 0
+    _CACHE["directory"] = None
+    _CACHE["entries"].clear()
+
+
+def _fingerprint(func_name, data, args, kwargs):
+    """
+    Cache key for a call, from a fast hash of the data and the arguments.
+
+    Parameters
+    ----------
+    func_name : str
+        Name of the cached function.
+    data : pd.DataFrame
+        The input data.
+    args, kwargs
+        Remaining arguments of the call.
+
+    Returns
+    -------
+    str
+        Hex digest identifying the call.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(func_name.encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).values)
+    digest.update(repr((list(data.columns), list(data.dtypes.astype(str)),
+                        args, sorted(kwargs.items()))).encode())
+    return digest.hexdigest()
+
+
+def _cached(func):
+    """
+    Decorator caching the result of a periodogram function in memory, with
+    LRU eviction, and optionally on disk. Does nothing while the cache is
+    disabled. Callers get a copy, so changing a result does not change the
+    cached value.
+    """
+    @wraps(func)
+    def wrapper(data, *args, **kwargs):
+        if not _CACHE["maxsize"] or not isinstance(data, pd.DataFrame):
+            return func(data, *args, **kwargs)
+
+        key = _fingerprint(func.__name__, data, args, kwargs)
+        entries = _CACHE["entries"]
+        path = None
+        if _CACHE["directory"] is not None:
+            path = os.path.join(_CACHE["directory"], f"{key}.pkl")
+
+        if key in entries:
+            entries.move_to_end(key)
+            result = entries[key]
+        elif path is not None and os.path.exists(path):
+            with open(path, "rb") as file:
+                result = pickle.load(file)
+        else:
+            result = func(data, *args, **kwargs)
+            if path is not None:
+                # write to a temporary file then rename, so readers never
+                # see a partial file
+                handle, tmp_path = tempfile.mkstemp(
+                    dir=_CACHE["directory"], suffix=".tmp")
+                with os.fdopen(handle, "wb") as file:
+                    pickle.dump(result, file)
+                os.replace(tmp_path, path)
+
+        entries[key] = result
+        while len(entries) > _CACHE["maxsize"]:
+            entries.popitem(last=False)
+
+        return copy.deepcopy(result)
+
+    return wrapper
+
+
+@_cached
 @prep.validate_input
 def lomb_scargle_period(data, subject_no=0, low_period=20, high_period=30,
+                        adaptive=False, n_coarse=500, top_k=3, n_fine=20,
                         **kwargs):
     """
     Calculates the Lomb-Scargle periodogram for a single column in a DataFrame.
@@ -24,6 +144,17 @@ def lomb_scargle_period(data, subject_no=0, low_period=20, high_period=30,
         The shortest period to search for, in hours. Default is 20.
     high_period : float, optional
         The longest period to search for, in hours. Default is 30.
+    adaptive : bool, optional
+        If True, scans a coarse grid of `n_coarse` frequencies and then
+        refines around the `top_k` highest peaks instead of evaluating a
+        fixed grid of 10,000 frequencies. Default is False.
+    n_coarse : int, optional
+        Number of frequencies in the coarse grid. Default is 500.
+    top_k : int, optional
+        Number of coarse peaks to refine. Default is 3.
+    n_fine : int, optional
+        Number of frequencies in the dense grid around each peak.
+        Default is 20.
 
     Returns
     -------
@@ -35,6 +166,8 @@ def lomb_scargle_period(data, subject_no=0, low_period=20, high_period=30,
                 Period corresponding to the maximum power, in hours.
             - "Power_values" : pd.Series
                 Power values for all test periods, indexed by period in hours.
+                In adaptive mode this holds the coarse and refined periods
+                that were evaluated.
 
     Raises
     ------
@@ -45,9 +178,8 @@ def lomb_scargle_period(data, subject_no=0, low_period=20, high_period=30,
 
     Notes
     -----
-    - The function assumes evenly spaced time-series data. If the time index is
-      irregular,
-      the results may be inaccurate.
+    - The actual timestamps are used, so the index may be irregular or have
+      gaps, and NaN samples are left out.
     - The power calculation may return NaN if the data is insufficient or
       contains only NaNs.
     """
@@ -62,29 +194,25 @@ def lomb_scargle_period(data, subject_no=0, low_period=20, high_period=30,
         raise ValueError(f"low_period ({low_period}) must be less than"
                          f"high_period ({high_period}).")
 
-    # get sampling frequency
-    sample_freq = pd.Timedelta(pd.infer_freq(data.index)).total_seconds()
+    # real observation times, so dropouts and uneven sampling are allowed
+    observation_times, sample_freq, positions = _regular_grid(data.index)
 
     # Define the range of frequencies to search in cycles/sample
     low_freq = 1 / (high_period * 3600)  # convert to seconds
     high_freq = 1 / (low_period * 3600)
-    freq = np.linspace(low_freq, high_freq, 10000)
-    freq_hours = 1 / (freq * 3600)
+    freq = np.linspace(low_freq, high_freq, n_coarse if adaptive else 10000)
 
-    # Prepare observations
-    observations = data.iloc[:, subject_no].values
-    if observations.size == 0 or np.all(np.isnan(observations)):
+    # Prepare observations, leaving out missing samples
+    observations = data.iloc[:, subject_no].values.astype(float)
+    valid = ~np.isnan(observations)
+    if observations.size == 0 or not valid.any():
         return {"Pmax": 0,
                 "Period": np.nan,
                 "Power_values": pd.Series(dtype=float)}
-    observation_times = np.arange(len(data)) * sample_freq
 
     # Calculate Lomb-Scargle periodogram
-    power = LombScargle(
-        observation_times,
-        observations).power(
-        freq,
-        method='auto')
+    model = LombScargle(observation_times[valid], observations[valid])
+    power = model.power(freq, method='auto')
 
     # Handle cases where the power calculation fails
     if pd.isnull(power[0]):
@@ -92,10 +220,913 @@ def lomb_scargle_period(data, subject_no=0, low_period=20, high_period=30,
 
     # Maximum power and its corresponding period in hours
     pmax = power.max()
-    best_period = freq_hours[np.argmax(power)]
+    best_freq = freq[np.argmax(power)]
+    if adaptive:
+        if positions is not None:
+            # exact power on the sampling grid, NaN where samples are missing
+            gridded = np.full((positions[-1] + 1, 1), np.nan)
+            gridded[positions, 0] = observations
+
+            def _evaluate(fine_freq):
+                return _ls_power(gridded, fine_freq[0],
+                                 fine_freq[1] - fine_freq[0], len(fine_freq),
+                                 sample_freq)[:, 0]
+        else:
+            def _evaluate(fine_freq):
+                return model.power(fine_freq, method="cython")
+
+        freq, power, best_freq, pmax = _refine_peaks(
+            _evaluate, freq, power, top_k=top_k, n_fine=n_fine)
+    freq_hours = 1 / (freq * 3600)
+    best_period = 1 / (best_freq * 3600)
 
     # Create a power series for the output
     power_values = pd.Series(
         power, index=freq_hours).sort_index()
 
     return {"Pmax": pmax, "Period": best_period, "Power_values": power_values}
+
+
+def _refine_peaks(evaluate, freq, power, top_k=3, n_fine=20):
+    """
+    Refines the highest peaks of a coarse periodogram.
+
+    Evaluates a dense grid spanning one coarse step either side of each of
+    the `top_k` highest local maxima, then fits a parabola through the best
+    fine point and its neighbours to place the peak between grid points.
+
+    Parameters
+    ----------
+    evaluate : callable
+        Takes an evenly spaced array of frequencies and returns the power at
+        each.
+    freq : np.ndarray
+        Evenly spaced coarse frequency grid.
+    power : np.ndarray
+        Power at each coarse frequency.
+    top_k : int, optional
+        Number of peaks to refine. Default is 3.
+    n_fine : int, optional
+        Number of frequencies in each dense grid. Default is 20.
+
+    Returns
+    -------
+    tuple
+        All evaluated frequencies and their power, sorted by frequency,
+        followed by the refined best frequency and its power.
+    """
+    step = freq[1] - freq[0]
+
+    # local maxima of the coarse grid, highest first
+    padded = np.concatenate([[-np.inf], np.nan_to_num(power, nan=-np.inf),
+                             [-np.inf]])
+    is_peak = (padded[1:-1] >= padded[:-2]) & (padded[1:-1] >= padded[2:])
+    candidates = np.flatnonzero(is_peak)
+    candidates = candidates[np.argsort(power[candidates])[::-1][:top_k]]
+
+    # the coarse grid only locates the peaks, the refined values are used
+    # even if a faster approximation gave a higher coarse power
+    all_freq, all_power = [freq], [power]
+    best_freq, best_power = freq[np.nanargmax(power)], -np.inf
+    for centre in candidates:
+        fine_freq = np.linspace(max(freq[centre] - step, freq[0]),
+                                min(freq[centre] + step, freq[-1]), n_fine)
+        fine_power = evaluate(fine_freq)
+        all_freq.append(fine_freq)
+        all_power.append(fine_power)
+
+        # parabolic interpolation around the best fine point
+        best = np.nanargmax(fine_power)
+        peak_freq, peak_power = fine_freq[best], fine_power[best]
+        if 0 < best < n_fine - 1:
+            left, mid, right = fine_power[best - 1:best + 2]
+            curvature = left - 2 * mid + right
+            if curvature < 0:
+                offset = 0.5 * (left - right) / curvature
+                peak_freq += offset * (fine_freq[1] - fine_freq[0])
+                peak_power = mid - 0.25 * (left - right) * offset
+        if peak_power > best_power:
+            best_freq, best_power = peak_freq, peak_power
+
+    all_freq = np.concatenate(all_freq)
+    all_power = np.concatenate(all_power)
+    order = np.argsort(all_freq, kind="stable")
+
+    return all_freq[order], all_power[order], best_freq, best_power
+
+
+def _peaks(power_values):
+    """
+    Maximum power and the period it occurs at for every column.
+
+    Parameters
+    ----------
+    power_values : pd.DataFrame
+        Power indexed by period, one column per subject.
+
+    Returns
+    -------
+    tuple of pd.Series
+        Maximum power and best period per column, NaN for columns without
+        any valid power.
+    """
+    power = power_values.values
+    valid = ~np.isnan(power).all(axis=0)
+    best = np.argmax(np.where(np.isnan(power), -np.inf, power), axis=0)
+    pmax = pd.Series(np.where(valid, power[best, np.arange(power.shape[1])],
+                              np.nan), index=power_values.columns)
+    best_period = pd.Series(
+        np.where(valid, power_values.index.values[best], np.nan),
+        index=power_values.columns)
+    return pmax, best_period
+
+
+def _chirp_z(x, f0, df, n_freqs, dt):
+    """
+    Fourier sums of evenly sampled data over a linear frequency grid.
+
+    Computes sum_n x[n] * exp(2j * pi * (f0 + k * df) * n * dt) for every
+    k in range(n_freqs) and every column of `x` using the chirp-z
+    (Bluestein) algorithm, so the cost is a few FFTs of length
+    len(x) + n_freqs rather than one trigonometric term per sample and
+    frequency. The chirp filter depends only on the time and frequency grid
+    and is shared by every column.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Evenly sampled data of shape (n_samples, n_columns).
+    f0 : float
+        First frequency of the grid, in Hz.
+    df : float
+        Spacing of the frequency grid, in Hz.
+    n_freqs : int
+        Number of frequencies in the grid.
+    dt : float
+        Sampling interval, in seconds.
+
+    Returns
+    -------
+    np.ndarray
+        Complex sums of shape (n_freqs, n_columns).
+    """
+    n_samples = x.shape[0]
+    n = np.arange(max(n_samples, n_freqs), dtype=float)
+    chirp = np.exp(1j * np.pi * ((df * dt * n * n) % 2))
+
+    # pre-multiply by the start frequency and the chirp
+    pre = np.exp(2j * np.pi * ((f0 * dt * n[:n_samples]) % 1))
+    pre *= chirp[:n_samples]
+
+    # chirp filter laid out for a circular convolution
+    fft_len = int(2 ** np.ceil(np.log2(n_samples + n_freqs - 1)))
+    kernel = np.zeros(fft_len, dtype=complex)
+    kernel[:n_freqs] = np.conj(chirp[:n_freqs])
+    kernel[fft_len - n_samples + 1:] = np.conj(chirp[1:n_samples][::-1])
+    kernel_fft = np.fft.fft(kernel)
+
+    # keep the FFT workspace bounded by transforming a block of columns,
+    # working along contiguous rows as that is much faster for pocketfft
+    block = max(1, 2 ** 24 // fft_len)
+    sums = np.empty((x.shape[1], n_freqs), dtype=complex)
+    for start in range(0, x.shape[1], block):
+        rows = np.ascontiguousarray(x[:, start:start + block].T) * pre
+        conv = np.fft.ifft(np.fft.fft(rows, n=fft_len) * kernel_fft)
+        sums[start:start + block] = conv[:, :n_freqs] * chirp[:n_freqs]
+
+    return sums.T
+
+
+def _gls_power(n, y_sum, yy_sum, trig_sum, trig2_sum, ytrig_sum):
+    """
+    Standard normalised Lomb-Scargle power with a floating mean from
+    weighted sums.
+
+    All sums are over the valid samples of a series and broadcast against
+    each other, so the same function serves whole recordings, sliding
+    windows and columns with different missing samples.
+
+    Parameters
+    ----------
+    n : np.ndarray
+        Number of valid samples.
+    y_sum, yy_sum : np.ndarray
+        Sums of y and y**2.
+    trig_sum, trig2_sum : np.ndarray
+        Complex sums of exp(i*w*t) and exp(2i*w*t).
+    ytrig_sum : np.ndarray
+        Complex sum of y * exp(i*w*t).
+
+    Returns
+    -------
+    np.ndarray
+        The broadcast power.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Y = y_sum / n
+        C, S = trig_sum.real / n, trig_sum.imag / n
+        CC = (n + trig2_sum.real) / (2 * n) - C * C
+        SS = (n - trig2_sum.real) / (2 * n) - S * S
+        CS = trig2_sum.imag / (2 * n) - C * S
+        YC = ytrig_sum.real / n - Y * C
+        YS = ytrig_sum.imag / n - Y * S
+        YY = yy_sum / n - Y * Y
+
+        power = (SS * YC * YC + CC * YS * YS - 2 * CS * YC * YS) / \
+            ((CC * SS - CS * CS) * YY)
+
+    return power
+
+
+def _regular_grid(index):
+    """
+    Observation times of a DatetimeIndex and their positions on a regular
+    sampling grid.
+
+    Parameters
+    ----------
+    index : pd.DatetimeIndex
+        Sorted timestamps, possibly with gaps from dropped samples.
+
+    Returns
+    -------
+    times : np.ndarray
+        Seconds since the first timestamp.
+    dt : float or None
+        The smallest spacing between timestamps, in seconds.
+    positions : np.ndarray or None
+        Integer position of every timestamp on a grid with spacing `dt`, or
+        None if the timestamps do not fall on such a grid or the grid would
+        be mostly empty.
+    """
+    times = np.asarray((index - index[0]).total_seconds(), dtype=float)
+    steps = np.diff(times)
+    steps = steps[steps > 0]
+    if not len(steps):
+        return times, None, None
+    dt = steps.min()
+    positions = np.rint(times / dt)
+    on_grid = np.allclose(positions * dt, times, rtol=0, atol=1e-6 * dt)
+    if not on_grid or (np.diff(positions) <= 0).any() or \
+            positions[-1] >= 4 * len(times):
+        return times, dt, None
+    return times, dt, positions.astype(int)
+
+
+def _column_power(times, values, freq, method="fast"):
+    """
+    Astropy Lomb-Scargle power of one series, leaving out NaN samples.
+
+    Parameters
+    ----------
+    times : np.ndarray
+        Observation times in seconds.
+    values : np.ndarray
+        Observations, may contain NaNs.
+    freq : np.ndarray
+        Frequencies to evaluate, in Hz.
+    method : str, optional
+        Method passed to `LombScargle.power`. Default is "fast".
+
+    Returns
+    -------
+    np.ndarray
+        Power at each frequency, NaN if fewer than three valid samples.
+    """
+    valid = ~np.isnan(values)
+    if valid.sum() < 3:
+        return np.full(len(freq), np.nan)
+    return LombScargle(times[valid], values[valid]).power(
+        freq, method=method)
+
+
+def _ls_power(y, f0, df, n_freqs, dt):
+    """
+    Standard normalised Lomb-Scargle power with a floating mean for all
+    columns of data on a regular sampling grid.
+
+    Gives the same result as astropy's `LombScargle(t, y).power(freq)`
+    with its default settings on the valid samples of each column, without
+    building one model per column. Missing samples are marked with NaN.
+    Columns sharing the same pattern of missing samples share the
+    trigonometric sums of their sampling times.
+
+    Parameters
+    ----------
+    y : np.ndarray
+        Data of shape (n_samples, n_columns) on a regular grid, with NaN
+        where a column has no sample.
+    f0, df, n_freqs, dt
+        Frequency grid and sampling interval as in `_chirp_z`.
+
+    Returns
+    -------
+    np.ndarray
+        Power of shape (n_freqs, n_columns).
+    """
+    n_samples = y.shape[0]
+    valid = ~np.isnan(y)
+
+    if valid.all():
+        # trig sums of the sampling grid, shared by every column
+        n = n_samples
+        y = y - y.mean(axis=0)
+        ones = np.ones((n_samples, 1))
+        trig_sum = _chirp_z(ones, f0, df, n_freqs, dt)
+        trig2_sum = _chirp_z(ones, 2 * f0, 2 * df, n_freqs, dt)
+    else:
+        # trig sums of each distinct mask, shared by the columns using it
+        n = valid.sum(axis=0)
+        y = np.where(valid, y, 0)
+        y = np.where(valid, y - y.sum(axis=0) / np.maximum(n, 1), 0)
+        masks, which = np.unique(valid.T, axis=0, return_inverse=True)
+        which = np.ravel(which)
+        masks = masks.T.astype(float)
+        trig_sum = _chirp_z(masks, f0, df, n_freqs, dt)[:, which]
+        trig2_sum = _chirp_z(masks, 2 * f0, 2 * df, n_freqs, dt)[:, which]
+
+    # data sums for every column at once
+    ytrig_sum = _chirp_z(y, f0, df, n_freqs, dt)
+
+    return _gls_power(n, y.sum(axis=0), (y * y).sum(axis=0),
+                      trig_sum, trig2_sum, ytrig_sum)
+
+
+@_cached
+@prep.validate_input
+def lomb_scargle_batch(data, low_period=20, high_period=30, n_periods=10000,
+                       method="matrix", n_jobs=None, adaptive=False,
+                       top_k=3, n_fine=20, **kwargs):
+    """
+    Calculates the Lomb-Scargle periodogram for every column of a DataFrame
+    on a shared frequency grid.
+
+    The sampling interval, frequency grid and trigonometric sums of the
+    sampling times are computed once and the power for all columns is
+    evaluated together, instead of building one `LombScargle` object per
+    column as `lomb_scargle_period` does.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Time-series data. The index represents time, and the columns contain
+        observations, with NaN for missing samples.
+    low_period : float, optional
+        The shortest period to search for, in hours. Default is 20.
+    high_period : float, optional
+        The longest period to search for, in hours. Default is 30.
+    n_periods : int, optional
+        Number of frequencies in the grid. Default is 10000, as used by
+        `lomb_scargle_period`.
+    method : str, optional
+        "matrix" evaluates all columns together on the sampling grid,
+        "astropy" runs astropy's fast method for each column in a thread
+        pool. "matrix" falls back to "astropy" when the timestamps do not
+        lie on a regular grid. Default is "matrix".
+    n_jobs : int, optional
+        Number of threads for the "astropy" method. Default is None, which
+        lets the pool decide.
+    adaptive : bool, optional
+        If True, treats the `n_periods` grid as a coarse scan and refines
+        the `top_k` highest peaks of each column as `lomb_scargle_period`
+        does, a coarse grid of a few hundred periods is then enough.
+        Default is False.
+    top_k : int, optional
+        Number of coarse peaks to refine per column. Default is 3.
+    n_fine : int, optional
+        Number of frequencies in the dense grid around each peak.
+        Default is 20.
+
+    Returns
+    -------
+    dict
+        A dictionary with the following keys:
+            - "Pmax" : pd.Series
+                Maximum power for each column.
+            - "Period" : pd.Series
+                Period corresponding to the maximum power, in hours.
+            - "Power_values" : pd.DataFrame
+                Power values for all test periods (rows, indexed by period in
+                hours) and columns. In adaptive mode only the shared coarse
+                grid is included.
+
+    Raises
+    ------
+    ValueError
+        If `low_period` is greater than or equal to `high_period`, or
+        `method` is not recognised.
+
+    Notes
+    -----
+    - NaN samples and gaps in the index are left out of each column, columns
+      with different missing samples are still evaluated together.
+    - Columns with fewer than three valid samples get NaN power.
+    """
+    # Validate periods
+    if low_period >= high_period:
+        raise ValueError(f"low_period ({low_period}) must be less than"
+                         f"high_period ({high_period}).")
+
+    if method not in ("matrix", "astropy"):
+        raise ValueError(f"method must be 'matrix' or 'astropy', "
+                         f"not {method!r}.")
+
+    # real observation times and, if they fall on one, the sampling grid
+    observation_times, sample_freq, positions = _regular_grid(data.index)
+
+    # Define the range of frequencies to search in cycles/sample
+    low_freq = 1 / (high_period * 3600)  # convert to seconds
+    high_freq = 1 / (low_period * 3600)
+    freq = np.linspace(low_freq, high_freq, n_periods)
+    freq_hours = 1 / (freq * 3600)
+
+    observations = data.values.astype(float)
+    if method == "matrix" and positions is not None:
+        # NaN marks missing samples, including gaps in the index
+        gridded = np.full((positions[-1] + 1, data.shape[1]), np.nan)
+        gridded[positions] = observations
+
+        def _evaluate(eval_freq, col=slice(None)):
+            return _ls_power(gridded[:, col], eval_freq[0],
+                             eval_freq[1] - eval_freq[0], len(eval_freq),
+                             sample_freq)
+
+        power = _evaluate(freq)
+    else:
+        def _evaluate(eval_freq, col):
+            return _column_power(observation_times, observations[:, col[0]],
+                                 eval_freq, method="cython")[:, None]
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            power = np.column_stack(list(pool.map(
+                lambda col: _column_power(
+                    observation_times, observations[:, col], freq),
+                range(data.shape[1]))))
+
+    power_values = pd.DataFrame(
+        power, index=freq_hours, columns=data.columns).sort_index()
+    pmax, best_period = _peaks(power_values)
+
+    # refine each column around its own coarse peaks
+    if adaptive:
+        for col in np.flatnonzero(pmax.notna().values):
+            *_, best_freq, best_power = _refine_peaks(
+                lambda fine_freq: _evaluate(fine_freq, [col])[:, 0],
+                freq, power[:, col], top_k=top_k, n_fine=n_fine)
+            pmax.iloc[col] = best_power
+            best_period.iloc[col] = 1 / (best_freq * 3600)
+
+    return {"Pmax": pmax, "Period": best_period, "Power_values": power_values}
+
+
+@_cached
+@prep.validate_input
+def chi_square_period(data, low_period=20, high_period=30, alpha=0.05,
+                      **kwargs):
+    """
+    Calculates the chi-square (Sokolove-Bushell) periodogram for every
+    column of a DataFrame.
+
+    Each column is folded at every candidate period that is a whole number
+    of samples between `low_period` and `high_period`. The data are
+    reshaped into complete cycles so the bin means come from one sum, and
+    the total variance of the folded span comes from cumulative sums.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Evenly sampled time-series data. The index represents time, and the
+        columns contain observations.
+    low_period : float, optional
+        The shortest period to test, in hours. Default is 20.
+    high_period : float, optional
+        The longest period to test, in hours. Default is 30.
+    alpha : float, optional
+        Significance level of the threshold. Default is 0.05.
+
+    Returns
+    -------
+    dict
+        A dictionary with the following keys:
+            - "Pmax" : pd.Series
+                Qp at the peak period for each column.
+            - "Period" : pd.Series
+                Period, in hours, where Qp exceeds the threshold by the most.
+            - "Power_values" : pd.DataFrame
+                Qp for all test periods (rows, indexed by period in hours)
+                and columns.
+            - "Threshold" : pd.Series
+                Chi-square significance threshold for each test period.
+
+    Raises
+    ------
+    ValueError
+        If `low_period` is greater than or equal to `high_period`.
+
+    Notes
+    -----
+    - Only the complete cycles at the start of the data are used for each
+      period, as in the original method.
+    - NaNs are left out of the bin means and the variance.
+    """
+    # Validate periods
+    if low_period >= high_period:
+        raise ValueError(f"low_period ({low_period}) must be less than"
+                         f"high_period ({high_period}).")
+
+    # candidate periods as whole numbers of samples
+    sample_freq = pd.Timedelta(pd.tseries.frequencies.to_offset(
+        pd.infer_freq(data.index))).total_seconds()
+    periods = np.arange(int(np.ceil(low_period * 3600 / sample_freq)),
+                        int(high_period * 3600 / sample_freq) + 1)
+
+    observations = data.values.astype(float)
+    valid = ~np.isnan(observations)
+    values = np.where(valid, observations, 0)
+
+    # running totals to get the variance of any leading span
+    zero_row = np.zeros((1, values.shape[1]))
+    cum_values = np.concatenate([zero_row, np.cumsum(values, axis=0)])
+    cum_squares = np.concatenate(
+        [zero_row, np.cumsum(values * values, axis=0)])
+    cum_valid = np.concatenate([zero_row, np.cumsum(valid, axis=0)])
+
+    qp = np.full((len(periods), values.shape[1]), np.nan)
+    for row, period in enumerate(periods):
+        n_cycles = len(values) // period
+        if n_cycles < 1:
+            continue
+        span = n_cycles * period
+
+        # fold into complete cycles and sum each bin
+        bin_sums = values[:span].reshape(n_cycles, period, -1).sum(axis=0)
+        bin_counts = valid[:span].reshape(n_cycles, period, -1).sum(axis=0)
+
+        n_valid = cum_valid[span]
+        mean = cum_values[span] / n_valid
+        total_var = cum_squares[span] - n_valid * mean * mean
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bin_means = bin_sums / bin_counts
+            bin_var = np.nansum(bin_counts * (bin_means - mean) ** 2, axis=0)
+            qp[row] = n_valid * bin_var / total_var
+
+    period_hours = periods * sample_freq / 3600
+    threshold = pd.Series(chi2.ppf(1 - alpha, periods - 1),
+                          index=period_hours)
+    power_values = pd.DataFrame(qp, index=period_hours, columns=data.columns)
+
+    # pick the period that exceeds the threshold by the most
+    _, best_period = _peaks(power_values.sub(threshold, axis=0))
+    pmax = pd.Series(
+        [power_values[col].get(period, np.nan)
+         for col, period in best_period.items()],
+        index=data.columns)
+
+    return {"Pmax": pmax,
+            "Period": best_period,
+            "Power_values": power_values,
+            "Threshold": threshold}
+
+
+@_cached
+@prep.validate_input
+def lomb_scargle_windowed(data, window="10D", step="1D", low_period=20,
+                          high_period=30, n_periods=1000, **kwargs):
+    """
+    Calculates Lomb-Scargle periodograms in sliding windows for every
+    column, to follow changes in period across a recording.
+
+    The data are cut into blocks of length `step` and the trigonometric
+    sums of each block are computed once for all columns. Sliding the
+    window then only adds the block entering and removes the block leaving,
+    using cumulative sums over blocks, instead of recomputing every window
+    from scratch.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Evenly sampled time-series data. The index represents time, and the
+        columns contain observations.
+    window : str, optional
+        Length of each window as a timedelta string, must be a whole number
+        of steps. Default is "10D".
+    step : str, optional
+        Distance between the starts of consecutive windows as a timedelta
+        string. Default is "1D".
+    low_period : float, optional
+        The shortest period to search for, in hours. Default is 20.
+    high_period : float, optional
+        The longest period to search for, in hours. Default is 30.
+    n_periods : int, optional
+        Number of frequencies in the grid. Default is 1000.
+
+    Returns
+    -------
+    pd.DataFrame
+        Power surface indexed by subject and window start time, with a
+        column for each test period in hours.
+
+    Raises
+    ------
+    ValueError
+        If `low_period` is greater than or equal to `high_period`, the
+        window is not a whole number of steps or is longer than the data.
+
+    Notes
+    -----
+    - Data after the last complete step are not used.
+    - NaN samples are left out of the windows that contain them.
+    """
+    # Validate periods
+    if low_period >= high_period:
+        raise ValueError(f"low_period ({low_period}) must be less than"
+                         f"high_period ({high_period}).")
+
+    sample_freq = pd.Timedelta(pd.tseries.frequencies.to_offset(
+        pd.infer_freq(data.index))).total_seconds()
+    step_len = int(round(pd.Timedelta(step).total_seconds() / sample_freq))
+    n_steps, remainder = divmod(
+        pd.Timedelta(window).total_seconds(),
+        pd.Timedelta(step).total_seconds())
+    n_steps = int(n_steps)
+    n_blocks = len(data) // step_len
+    if remainder or n_steps < 1:
+        raise ValueError(f"window ({window}) must be a whole number of "
+                         f"steps ({step}).")
+    if n_steps > n_blocks:
+        raise ValueError(f"window ({window}) is longer than the data.")
+
+    # Define the range of frequencies to search in cycles/sample
+    low_freq = 1 / (high_period * 3600)  # convert to seconds
+    high_freq = 1 / (low_period * 3600)
+    freq = np.linspace(low_freq, high_freq, n_periods)
+    freq_step = freq[1] - freq[0]
+
+    # cut into blocks, centring first keeps the sums well conditioned
+    observations = data.values[:n_blocks * step_len].astype(float)
+    observations = observations - np.nanmean(observations, axis=0)
+    valid = ~np.isnan(observations)
+    values = np.where(valid, observations, 0)
+    n_cols = values.shape[1]
+    blocks = values.reshape(n_blocks, step_len, n_cols)
+    valid_blocks = valid.reshape(n_blocks, step_len, n_cols)
+
+    # every block starts at a different time, so shift its phase
+    block_starts = np.arange(n_blocks) * step_len * sample_freq
+    shift = np.exp(2j * np.pi * ((np.outer(block_starts, freq)) % 1))
+    shift2 = shift * shift
+
+    def _block_sums(x, f0, df):
+        # sums within every block and column, shape (blocks, freqs, cols)
+        flat = x.transpose(1, 0, 2).reshape(step_len, -1)
+        sums = _chirp_z(flat, f0, df, n_periods, sample_freq)
+        return sums.reshape(n_periods, x.shape[0], x.shape[2]).transpose(
+            1, 0, 2)
+
+    ytrig = _block_sums(blocks, low_freq, freq_step) * shift[..., None]
+    if valid.all():
+        # the sampling grid is the same in every block and column
+        ones = np.ones((1, step_len, 1))
+        trig = _block_sums(ones, low_freq, freq_step) * shift[..., None]
+        trig2 = _block_sums(
+            ones, 2 * low_freq, 2 * freq_step) * shift2[..., None]
+    else:
+        mask = valid_blocks.astype(float)
+        trig = _block_sums(mask, low_freq, freq_step) * shift[..., None]
+        trig2 = _block_sums(
+            mask, 2 * low_freq, 2 * freq_step) * shift2[..., None]
+    counts = valid_blocks.sum(axis=1)[:, None, :]
+    y_sums = blocks.sum(axis=1)[:, None, :]
+    yy_sums = (blocks * blocks).sum(axis=1)[:, None, :]
+
+    def _sliding(block_sums):
+        # add the entering block and drop the leaving one for each window
+        cum = np.cumsum(block_sums, axis=0)
+        out = cum[n_steps - 1:].copy()
+        out[1:] -= cum[:-n_steps]
+        return out
+
+    power = _gls_power(_sliding(counts), _sliding(y_sums),
+                       _sliding(yy_sums), _sliding(trig), _sliding(trig2),
+                       _sliding(ytrig))
+
+    # subjects by window start by period
+    window_starts = data.index[0] + np.arange(power.shape[0]) * \
+        pd.Timedelta(step)
+    surface = power.transpose(2, 0, 1).reshape(-1, n_periods)
+    index = pd.MultiIndex.from_product(
+        [data.columns, window_starts], names=["subject", "window_start"])
+    power_surface = pd.DataFrame(
+        surface, index=index, columns=1 / (freq * 3600))
+
+    return power_surface.sort_index(axis=1)
+
+
+def _permutation_maxima(values, seed, n_permutations, f0, df, n_freqs, dt):
+    """
+    Maximum Lomb-Scargle power of shuffled copies of a series.
+
+    Kept at module level so it can be sent to worker processes.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Observations on a regular sampling grid, NaN where missing. Only
+        the valid samples are shuffled, so every copy keeps the sampling
+        pattern of the original.
+    seed : np.random.SeedSequence
+        Seed for this batch of permutations.
+    n_permutations : int
+        Number of shuffled copies to evaluate together.
+    f0, df, n_freqs, dt
+        Frequency grid and sampling interval as in `_chirp_z`.
+
+    Returns
+    -------
+    np.ndarray
+        Maximum power of each shuffled copy.
+    """
+    rng = np.random.default_rng(seed)
+    valid = ~np.isnan(values)
+    shuffled = np.full((len(values), n_permutations), np.nan)
+    shuffled[valid] = rng.permuted(
+        np.repeat(values[valid, None], n_permutations, axis=1), axis=0)
+    power = _ls_power(shuffled, f0, df, n_freqs, dt)
+    return np.nanmax(power, axis=0)
+
+
+@_cached
+@prep.validate_input
+def lomb_scargle_significance(data, low_period=20, high_period=30,
+                              n_periods=1000, n_permutations=1000,
+                              batch_size=50, n_jobs=None, seed=0,
+                              **kwargs):
+    """
+    Lomb-Scargle periodogram peaks with permutation-based false-alarm
+    probabilities for every column.
+
+    Each column is shuffled `n_permutations` times and the maximum power of
+    each shuffled copy is compared to the observed peak. Shuffled copies
+    are evaluated `batch_size` at a time as the columns of one batched
+    periodogram, and batches are spread over a process pool.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Time-series data on a regular sampling grid. The index represents
+        time, and the columns contain observations, with NaN for missing
+        samples.
+    low_period : float, optional
+        The shortest period to search for, in hours. Default is 20.
+    high_period : float, optional
+        The longest period to search for, in hours. Default is 30.
+    n_periods : int, optional
+        Number of frequencies in the grid. Default is 1000.
+    n_permutations : int, optional
+        Number of shuffled copies per column. Default is 1000.
+    batch_size : int, optional
+        Number of shuffled copies evaluated together. Default is 50.
+    n_jobs : int, optional
+        Number of worker processes, 1 runs in the current process. Default
+        is None, which lets the pool decide.
+    seed : int, optional
+        Seed for the random number generator. Every batch gets its own
+        child seed so results do not depend on `n_jobs`. Default is 0.
+
+    Returns
+    -------
+    dict
+        The output of `lomb_scargle_batch` with an extra key:
+            - "FAP" : pd.Series
+                Empirical false-alarm probability of the peak of each
+                column, (1 + exceedances) / (1 + n_permutations).
+
+    Raises
+    ------
+    ValueError
+        If the timestamps do not lie on a regular sampling grid.
+
+    Notes
+    -----
+    - NaN samples and gaps in the index are left out, only the valid
+      samples of each column are shuffled.
+    - Columns with fewer than three valid samples get a NaN false-alarm
+      probability.
+    """
+    # permutations are evaluated on the grid used by lomb_scargle_batch
+    _, sample_freq, positions = _regular_grid(data.index)
+    if positions is None:
+        raise ValueError("Timestamps must lie on a regular sampling grid "
+                         "to estimate false-alarm probabilities.")
+    gridded = np.full((positions[-1] + 1, data.shape[1]), np.nan)
+    gridded[positions] = data.values.astype(float)
+
+    result = lomb_scargle_batch(data, low_period=low_period,
+                                high_period=high_period, n_periods=n_periods)
+
+    low_freq = 1 / (high_period * 3600)
+    freq_step = (1 / (low_period * 3600) - low_freq) / (n_periods - 1)
+
+    # one job per batch of permutations per column, each with its own seed
+    batch_sizes = [min(batch_size, n_permutations - start)
+                   for start in range(0, n_permutations, batch_size)]
+    columns = np.flatnonzero(result["Pmax"].notna().values)
+    seeds = np.random.SeedSequence(seed).spawn(
+        len(data.columns) * len(batch_sizes))
+    jobs = [(gridded[:, col], seeds[col * len(batch_sizes) + batch], size,
+             low_freq, freq_step, n_periods, sample_freq)
+            for col in columns for batch, size in enumerate(batch_sizes)]
+
+    if n_jobs == 1:
+        maxima = [_permutation_maxima(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            maxima = list(pool.map(_permutation_maxima, *zip(*jobs)))
+
+    fap = pd.Series(np.nan, index=data.columns)
+    for pos, col in enumerate(columns):
+        col_maxima = np.concatenate(
+            maxima[pos * len(batch_sizes):(pos + 1) * len(batch_sizes)])
+        exceedances = (col_maxima >= result["Pmax"].iloc[col]).sum()
+        fap.iloc[col] = (1 + exceedances) / (1 + n_permutations)
+    result["FAP"] = fap
+
+    return result
+
+
+@_cached
+@prep.validate_input
+def autocorrelation_period(data, low_period=20, high_period=30, **kwargs):
+    """
+    Estimates the period and rhythmicity index of every column from its
+    autocorrelation function.
+
+    The autocorrelation of all columns is computed at once with
+    zero-padded real FFTs, which is much cheaper than a periodogram and
+    suited to screening many recordings before a full analysis.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Evenly sampled time-series data. The index represents time, and the
+        columns contain observations.
+    low_period : float, optional
+        The shortest period to search for, in hours. Default is 20.
+    high_period : float, optional
+        The longest period to search for, in hours. Default is 30.
+
+    Returns
+    -------
+    dict
+        A dictionary with the following keys:
+            - "RI" : pd.Series
+                Rhythmicity index, the autocorrelation at the peak in the
+                period range, for each column.
+            - "Period" : pd.Series
+                Lag of that peak in hours for each column.
+            - "ACF" : pd.DataFrame
+                Autocorrelation indexed by lag in hours, up to
+                `high_period`, one column per subject.
+
+    Raises
+    ------
+    ValueError
+        If `low_period` is greater than or equal to `high_period`.
+
+    Notes
+    -----
+    - Only local maxima of the autocorrelation count as peaks, columns
+      without one in the period range get NaN.
+    - NaN samples are set to the column mean before correlating.
+    """
+    # Validate periods
+    if low_period >= high_period:
+        raise ValueError(f"low_period ({low_period}) must be less than"
+                         f"high_period ({high_period}).")
+
+    sample_freq = pd.Timedelta(pd.tseries.frequencies.to_offset(
+        pd.infer_freq(data.index))).total_seconds()
+    max_lag = min(int(high_period * 3600 // sample_freq) + 1, len(data) - 1)
+
+    # centre, then pad to avoid circular wrap around
+    values = data.values.astype(float)
+    values = np.nan_to_num(values - np.nanmean(values, axis=0))
+    n_fft = 1 << int(np.ceil(np.log2(2 * len(values))))
+    spectrum = np.fft.rfft(values, n=n_fft, axis=0)
+    acf = np.fft.irfft(spectrum * spectrum.conj(), n=n_fft, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acf = acf[:max_lag + 1] / acf[0]
+
+    lags = np.arange(max_lag + 1) * sample_freq / 3600
+    acf_values = pd.DataFrame(acf, index=lags, columns=data.columns)
+
+    # keep local maxima inside the period range
+    peaks = np.full(acf.shape, np.nan)
+    local_max = (acf[1:-1] >= acf[:-2]) & (acf[1:-1] > acf[2:])
+    in_range = (lags[1:-1] >= low_period) & (lags[1:-1] <= high_period)
+    keep = local_max & in_range[:, None]
+    peaks[1:-1][keep] = acf[1:-1][keep]
+    ri, best_period = _peaks(
+        pd.DataFrame(peaks, index=lags, columns=data.columns))
+
+    return {"RI": ri, "Period": best_period, "ACF": acf_values}
@@ -5,10 +5,74 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gs
 from matplotlib.transforms import Bbox
+from matplotlib.collections import PolyCollection
 import circaPy.activity as act
 import circaPy.preprocessing as prep
 
 
+def _minmax_decimate(x, y, n_bins):
+    """
+    Reduces a trace to the minimum and maximum of each of `n_bins`
+    contiguous bins, so it looks the same when each bin is no wider than a
+    pixel.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Sample positions, numeric or datetime64.
+    y : np.ndarray
+        Values, NaNs are ignored unless a whole bin is NaN.
+    n_bins : int
+        Number of bins, usually the width of the Axes in pixels.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        Positions and values with two points per bin, the bin minimum
+        followed by its maximum, both at the start of the bin. Traces with
+        no more than two points per bin are returned unchanged.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    if len(y) <= 2 * n_bins:
+        return x, y
+    edges = np.unique(np.linspace(0, len(y), n_bins + 1).astype(int)[:-1])
+    with np.errstate(invalid="ignore"):
+        y_min = np.fmin.reduceat(y, edges)
+        y_max = np.fmax.reduceat(y, edges)
+    return np.repeat(x[edges], 2), np.column_stack([y_min, y_max]).ravel()
+
+
+def _decimation_bins(axis, n_points, decimate):
+    """
+    Number of bins to decimate a trace to for the pixel width of an Axes.
+
+    Parameters
+    ----------
+    axis : matplotlib.axes.Axes
+        Axes the trace is drawn on.
+    n_points : int
+        Number of points in the trace.
+    decimate : bool or str
+        True always decimates, False never does and "auto" only when there
+        are more than two points per pixel column.
+
+    Returns
+    -------
+    int or None
+        Number of bins, None if the trace should be drawn as it is.
+    """
+    if decimate is False:
+        return None
+    if decimate not in (True, "auto"):
+        raise ValueError(f"decimate must be True, False or 'auto', "
+                         f"not {decimate!r}.")
+    n_bins = max(int(axis.get_window_extent().width), 1)
+    if decimate == "auto" and n_points <= 2 * n_bins:
+        return None
+    return n_bins
+
+
 @prep.validate_input
 @prep.invert_light_values
 @prep.plot_kwarg_decorator
@@ -22,6 +86,7 @@ def plot_actogram(data,
                   start_day=0,
                   day_label_size=5,
                   linewidth=0.5,
+                  decimate="auto",
                   **kwargs):
     """
     Plot an double plotted actogram of activity data over several days
@@ -55,6 +120,10 @@ def plot_actogram(data,
         sets which day to start as day 0 in plot, defaults to 0
     day_label_size : int
         sets size of labels on bottom x axis, defaults to 5
+    decimate : bool or str
+        reduce each row to the min/max envelope of every pixel column.
+        "auto" does so when there are more than two points per pixel,
+        defaults to "auto"
 
     Returns
     -------
@@ -133,6 +202,9 @@ def plot_actogram(data,
             fig.add_subplot(sub_ax)
             ax.append(sub_ax)
 
+    # rows all share the same width, so decide on decimation once
+    n_bins = _decimation_bins(ax[0], 2 * day_length, decimate)
+
     # select each day to then plot on separate axis
     # plot two days on each row
     for day_label, axis in zip(days, ax):
@@ -146,14 +218,23 @@ def plot_actogram(data,
         fill_data = curr_data.where(curr_data > 0)
         fill_ldr = curr_data_light.where(curr_data_light > 0)
 
+        # keep the min/max envelope of every pixel column
+        line_x, line_y = curr_data.index.values, curr_data.values
+        fill_x, fill_y = fill_data.index.values, fill_data.values
+        ldr_x, ldr_y = fill_ldr.index.values, fill_ldr.values
+        if n_bins:
+            line_x, line_y = _minmax_decimate(line_x, line_y, n_bins)
+            fill_x, fill_y = _minmax_decimate(fill_x, fill_y, n_bins)
+            ldr_x, ldr_y = _minmax_decimate(ldr_x, ldr_y, n_bins)
+
         # plot the data and light_col
-        axis.fill_between(fill_ldr.index,
-                          fill_ldr,
+        axis.fill_between(ldr_x,
+                          ldr_y,
                           alpha=ldralpha,
                           facecolor="grey")
-        axis.plot(curr_data, linewidth=linewidth)
-        axis.fill_between(fill_data.index,
-                          fill_data)
+        axis.plot(line_x, line_y, linewidth=linewidth)
+        axis.fill_between(fill_x,
+                          fill_y)
 
         # need to hide all the axis to make visible
         axis.set(xticks=[],
@@ -201,6 +282,7 @@ def plot_activity_profile(data,
                           subplot=None,
                           resample=False,
                           resample_freq="h",
+                          decimate="auto",
                           *args,
                           **kwargs):
     """
@@ -228,6 +310,10 @@ def plot_activity_profile(data,
         This can be any valid pandas offset string
         (e.g., "h" for hourly, "min" for minutely).
         The default is "h" (hourly).
+    decimate : bool or str, optional
+        Whether to reduce the traces to the min/max envelope of every
+        pixel column. "auto" does so when there are more than two points
+        per pixel (default is "auto").
     *args, **kwargs : additional arguments
         These are passed to the plotting function,
         such as `timeaxis` to control the appearance of the x-axis.
@@ -284,15 +370,26 @@ def plot_activity_profile(data,
         fig = plt.gcf()
         ax = subplot
 
+    # keep the min/max envelope of every pixel column
+    mean_x, mean_y = mean.index.values, mean.values
+    sem_x, lower, upper = mean_x, (mean - sem).values, (mean + sem).values
+    n_bins = _decimation_bins(ax, len(mean), decimate)
+    if n_bins:
+        mean_x, mean_y = _minmax_decimate(mean_x, mean_y, n_bins)
+        sem_x, lower = _minmax_decimate(sem_x, lower, n_bins)
+        _, upper = _minmax_decimate(mean.index.values, upper, n_bins)
+        lower = np.repeat(lower[::2], 2)
+        upper = np.repeat(upper[1::2], 2)
+
     # Plot the mean line
     ax.plot(
-        mean.index, mean, label="Mean Activity", color="blue", linewidth=2)
+        mean_x, mean_y, label="Mean Activity", color="blue", linewidth=2)
 
     # Add shaded SEM region
     ax.fill_between(
-        mean.index,
-        mean - sem,
-        mean + sem,
+        sem_x,
+        lower,
+        upper,
         color="blue",
         alpha=0.3,
         label="± SEM"
@@ -319,9 +416,13 @@ def plot_activity_profile(data,
                               ) * (target_max - target_min) + target_min
 
     # Add lights region
+    light_x, light_y = scaled_light_mean.index.values, \
+        scaled_light_mean.values
+    if n_bins:
+        light_x, light_y = _minmax_decimate(light_x, light_y, n_bins)
     ax.fill_between(
-        scaled_light_mean.index,
-        scaled_light_mean,
+        light_x,
+        light_y,
         color='grey',
         alpha=0.2
     )
@@ -349,3 +450,305 @@ def plot_activity_profile(data,
         params_dict['timeaxis'] = kwargs["timeaxis"]
 
     return fig, ax, params_dict
+
+
+def _double_plot_matrix(data):
+    """
+    Folds evenly sampled data into a double plotted matrix with a single
+    reshape.
+
+    Row r holds day r - 1 followed by day r, so the first row starts with a
+    blank day and the last row ends with one, as in `plot_actogram`.
+
+    Parameters
+    ----------
+    data : pd.Series or pd.DataFrame
+        Evenly sampled time-indexed data.
+
+    Returns
+    -------
+    matrix : np.ndarray
+        Array of shape (n_days + 1, 2 * bins_per_day) for a Series, with an
+        extra trailing axis over columns for a DataFrame, NaN where there
+        is no data.
+    days : pd.DatetimeIndex
+        Date of the second half of each row.
+    bins_per_day : int
+        Number of samples in one day.
+    """
+    freq = pd.Timedelta(pd.tseries.frequencies.to_offset(
+        pd.infer_freq(data.index)))
+    bins_per_day = int(pd.Timedelta("1D") / freq)
+    origin = data.index[0].normalize()
+    positions = np.asarray((data.index - origin) // freq)
+    n_days = positions[-1] // bins_per_day + 1
+
+    # one blank day either side so every row is two whole days
+    values = data.values.astype(float)
+    folded = np.full(((n_days + 2) * bins_per_day,) + values.shape[1:],
+                     np.nan)
+    folded[bins_per_day + positions] = values
+    folded = folded.reshape((n_days + 2, bins_per_day) + values.shape[1:])
+    matrix = np.concatenate([folded[:-1], folded[1:]], axis=1)
+
+    days = pd.date_range(origin, periods=n_days + 1, freq="D")
+    return matrix, days, bins_per_day
+
+
+def _shade_image(shading, ldralpha):
+    """
+    RGBA image of grey shading, transparent where `shading` is False.
+    """
+    shade = np.zeros(shading.shape + (4,))
+    shade[..., :3] = 0.5
+    shade[..., 3] = np.where(shading, ldralpha, 0)
+    return shade
+
+
+def _actogram_rows(axis, activity, shade, ylim, style, color):
+    """
+    Draws a double plotted activity matrix and its light shading on a
+    single Axes, one unit of height per row with the first row at the top.
+
+    Parameters
+    ----------
+    axis : matplotlib.axes.Axes
+        Axes to draw on.
+    activity : np.ndarray
+        Matrix of shape (n_rows, n_bins) from `_double_plot_matrix`.
+    shade : np.ndarray
+        Shading image from `_shade_image`, can be shared between Axes.
+    ylim : list of two floats
+        Activity mapped to the bottom and top of each row.
+    style : str
+        "poly" draws activity as one PolyCollection, "image" as a heat map.
+    color : str
+        Colour of the activity.
+    """
+    n_rows, n_bins = activity.shape
+    extent = [0, 48, 0, n_rows]
+
+    # shading as a single image
+    axis.imshow(shade, extent=extent, aspect="auto",
+                interpolation="nearest", origin="upper")
+    height = np.clip((activity - ylim[0]) / (ylim[1] - ylim[0]), 0, 1)
+    height = np.where(activity > 0, height, 0)
+    if style == "image":
+        axis.imshow(np.ma.masked_equal(height, 0), extent=extent,
+                    aspect="auto", interpolation="nearest", origin="upper",
+                    cmap="Greys", vmin=0, vmax=1)
+    elif style == "poly":
+        # one polygon per row, closed along the baseline
+        x = np.arange(n_bins) * 48 / n_bins
+        base = (n_rows - 1 - np.arange(n_rows))[:, None]
+        verts = np.empty((n_rows, n_bins + 2, 2))
+        verts[:, 1:-1, 0] = x
+        verts[:, 1:-1, 1] = base + height
+        verts[:, 0] = np.column_stack([np.zeros(n_rows), base[:, 0]])
+        verts[:, -1] = np.column_stack(
+            [np.full(n_rows, x[-1]), base[:, 0]])
+        axis.add_collection(PolyCollection(
+            verts, facecolors=color, edgecolors="none"))
+    else:
+        raise ValueError(f"style must be 'poly' or 'image', not {style!r}.")
+
+    axis.set(xlim=[0, 48], ylim=[0, n_rows], yticks=[],
+             xticks=np.arange(0, 49, 6))
+    for pos in ["left", "right", "top"]:
+        axis.spines[pos].set_visible(False)
+
+
+@prep.validate_input
+@prep.invert_light_values
+@prep.plot_kwarg_decorator
+def plot_actogram_raster(data,
+                         subject_no=0,
+                         light_col=-1,
+                         ylim=[0, 120],
+                         fig=False,
+                         subplot=False,
+                         ldralpha=0.5,
+                         start_day=0,
+                         day_label_size=5,
+                         style="poly",
+                         color="C0",
+                         **kwargs):
+    """
+    Plot a double plotted actogram on a single Axes, for long recordings.
+
+    The double plotted matrix (days x 2 * bins) is built with one reshape
+    and drawn as a single PolyCollection or image, with the light shading
+    as one image, instead of one Axes and several artists per day as in
+    `plot_actogram`. Render time and file size grow slowly with the number
+    of days.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Evenly sampled, time-indexed activity values in columns for each
+        subject and one column for the light levels.
+    subject_no : int
+        which column number to plot, defaults to 0
+    light_col : int
+        which columns contains light information, defaults to -1
+    ylim : list of two ints
+        activity values mapped to the bottom and top of each row
+    fig : matplotlib figure object
+        Figure to create plot on, if not passed a new figure is created
+    subplot : matplotlib axes object
+        Axes on which to draw the actogram, used together with `fig`
+    ldralpha : float
+        Set the alpha level for how opaque to have the light shading,
+        defaults to 0.5
+    start_day : int
+        sets which day to start as day 0 in plot, defaults to 0
+    day_label_size : int
+        sets size of day labels, defaults to 5
+    style : str
+        "poly" draws activity as filled traces, "image" as a heat map,
+        defaults to "poly"
+    color : str
+        colour of the activity, defaults to "C0"
+
+    Returns
+    -------
+    matplotlib.pyplot.figure
+        instance containing overall figure
+    matplotlib.pyplot.Axes
+        the single Axes holding the actogram
+    dict
+        dict containing plotting kwargs
+    """
+    # check if data is empty
+    if data.empty:
+        raise ValueError("Input Dataframe is empty. Cannot plot actogram")
+
+    # fold activity and light in the same way
+    col_data = data.columns[subject_no]
+    ldr_col = data.columns[light_col]
+    matrix, days, _ = _double_plot_matrix(data[[col_data, ldr_col]])
+    activity, light = matrix[..., 0], matrix[..., 1]
+
+    if not fig:
+        fig, ax = plt.subplots()
+    else:
+        ax = subplot
+    _actogram_rows(ax, activity, _shade_image(light > 0, ldralpha), ylim,
+                   style, color)
+
+    # label every 10th row from the top
+    rows = np.arange(0, len(days), 10)
+    ax.set_yticks(len(days) - rows - 0.5)
+    ax.set_yticklabels(rows + start_day, fontsize=day_label_size)
+    ax.tick_params(axis="y", length=0)
+
+    # create defaults dict
+    params_dict = {
+        "xlabel": "Time (hours)",
+        "ylabel": "Days",
+        "title": "Double Plotted Actogram",
+        "timeaxis": False,
+        "subplot": subplot
+    }
+
+    return fig, ax, params_dict
+
+
+@prep.validate_input
+@prep.invert_light_values
+@prep.plot_kwarg_decorator
+def plot_actogram_cohort(data,
+                         light_col=-1,
+                         subject_nos=None,
+                         ncols=4,
+                         ylim=[0, 120],
+                         ldralpha=0.5,
+                         start_day=0,
+                         day_label_size=5,
+                         style="poly",
+                         color="C0",
+                         **kwargs):
+    """
+    Plot double plotted actograms of several subjects on a grid of axes.
+
+    The double plotted matrix of every subject and the light shading are
+    prepared once for the whole cohort, then each subject is drawn on a
+    single Axes as in `plot_actogram_raster`.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Evenly sampled, time-indexed activity values in columns for each
+        subject and one column for the light levels.
+    light_col : int
+        which columns contains light information, defaults to -1
+    subject_nos : list of int
+        column numbers to plot, e.g. one page of a large cohort, defaults
+        to every column except the light
+    ncols : int
+        number of columns in the grid, defaults to 4
+    ylim : list of two ints
+        activity values mapped to the bottom and top of each row
+    ldralpha : float
+        Set the alpha level for how opaque to have the light shading,
+        defaults to 0.5
+    start_day : int
+        sets which day to start as day 0 in plot, defaults to 0
+    day_label_size : int
+        sets size of day labels, defaults to 5
+    style : str
+        "poly" draws activity as filled traces, "image" as a heat map,
+        defaults to "poly"
+    color : str
+        colour of the activity, defaults to "C0"
+
+    Returns
+    -------
+    matplotlib.pyplot.figure
+        instance containing overall figure
+    list of matplotlib.pyplot.Axes
+        one Axes per subject, in the order plotted
+    dict
+        dict containing plotting kwargs
+    """
+    # check if data is empty
+    if data.empty:
+        raise ValueError("Input Dataframe is empty. Cannot plot actogram")
+
+    # fold every subject and the light together in one reshape
+    light_pos = np.arange(data.shape[1])[light_col]
+    if subject_nos is None:
+        subject_nos = [col for col in range(data.shape[1])
+                       if col != light_pos]
+    matrix, days, _ = _double_plot_matrix(
+        data.iloc[:, list(subject_nos) + [light_pos]])
+    shade = _shade_image(matrix[..., -1] > 0, ldralpha)
+
+    nrows = int(np.ceil(len(subject_nos) / ncols))
+    fig, grid = plt.subplots(nrows=nrows, ncols=ncols, squeeze=False,
+                             sharex=True, sharey=True)
+    grid = grid.ravel()
+    rows = np.arange(0, len(days), 10)
+    for pos, (subject, axis) in enumerate(zip(subject_nos, grid)):
+        _actogram_rows(axis, matrix[..., pos], shade, ylim, style, color)
+        axis.set_title(data.columns[subject], fontsize="small")
+        axis.set_yticks(len(days) - rows - 0.5)
+        axis.set_yticklabels(rows + start_day, fontsize=day_label_size)
+        axis.tick_params(axis="y", length=0)
+
+    # hide the unused end of the grid
+    for axis in grid[len(subject_nos):]:
+        axis.set_visible(False)
+    ax = list(grid[:len(subject_nos)])
+    for axis in ax[-ncols:]:
+        axis.xaxis.set_tick_params(labelbottom=True)
+
+    # create defaults dict
+    params_dict = {
+        "xlabel": "Time (hours)",
+        "ylabel": "Days",
+        "title": "Double Plotted Actograms",
+        "timeaxis": False,
+    }
+
+    return fig, ax, params_dict
@@ -1,8 +1,17 @@
 # functions for sleep processing
 
 import os
+import glob
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import pandas as pd
 import circaPy.preprocessing as prep
+from circaPy.episodes import _run_bounds
+from numpy.lib.stride_tricks import sliding_window_view
 
 
 def sleep_process(data, window=4):
@@ -39,41 +48,70 @@ def _score_active_times(data,
                         ldr_col=-1,
                         test_col=0,
                         threshold=1,
-                        drop_level=True):
+                        drop_level=True,
+                        scorer=sleep_process,
+                        window=4):
     """
     Scores all times between start and end of activity as sleep, sets all
-    other values to 0
+    other values to 0. With a MultiIndex, every combination of the levels
+    before the last (time) level is a separate recording, e.g. animal and
+    condition, and is scored and trimmed on its own without reshaping the
+    frame. The rows of each recording must be contiguous and in time order.
     :param data:
     :param ldr_col:
     :param test_col:
     :param threshold:
-    :param drop_level:
+    :param drop_level: kept for compatibility, the index is now used as it
+        is
+    :param scorer: function taking the activity data and returning scores,
+        or one of "window", "cole_kripke" or "sadeh"
+    :param window: window length in epochs for the default `sleep_process`
+        scorer, ignored by the other scorers
     :return:
     """
-    if drop_level:
-        data = data.reset_index(0)
-        label_name = data.columns[0]
-        label_col = data.pop(label_name)
+    scorer = _get_scorer(scorer)
 
     # score the df minus the LDR
     ldr_label = data.columns[ldr_col]
-    ldr_data = data.pop(ldr_label)
-    scored_df = sleep_process(data)
+    activity = data.drop(columns=ldr_label)
+    values = activity.values
+    n_epochs = len(values)
 
-    # find start and end of activity
-    mask = data.iloc[:, test_col] > threshold
-    start = data.where(mask).first_valid_index()
-    end = data.where(mask)[::-1].first_valid_index()
+    # contiguous blocks of rows from the same recording
+    if isinstance(data.index, pd.MultiIndex):
+        codes = pd.factorize(data.index.droplevel(-1))[0]
+        group_starts = np.flatnonzero(np.diff(codes, prepend=-1) != 0)
+    else:
+        group_starts = np.array([0])
+    group_ends = np.append(group_starts[1:], n_epochs)
+    group = np.repeat(np.arange(len(group_starts)), group_ends - group_starts)
+    position = np.arange(n_epochs) - group_starts[group]
 
-    # set scored df times outside of start and end to be 0
-    scored_df.loc[:start] = 0
-    scored_df.loc[end:] = 0
-    scored_df[ldr_label] = ldr_data
+    if scorer is sleep_process:
+        # rolling window from one cumulative count, restarted per group
+        counts = np.zeros((n_epochs + 1, values.shape[1]), dtype=np.int64)
+        np.cumsum(~(values == 0), axis=0, out=counts[1:])
+        ends = np.arange(1, n_epochs + 1)
+        scores = (counts[ends] - counts[np.maximum(ends - window, 0)] == 0) \
+            & (position >= window - 1)[:, None]
+        scores = scores.astype(int)
+    else:
+        scores = np.concatenate([
+            scorer(activity.iloc[start:end]).values
+            for start, end in zip(group_starts, group_ends)])
+
+    # find start and end of activity of every group
+    active = activity.iloc[:, test_col].values > threshold
+    first = np.minimum.reduceat(
+        np.where(active, position, n_epochs), group_starts)
+    last = np.maximum.reduceat(np.where(active, position, -1), group_starts)
 
-    if drop_level:
-        scored_df[label_name] = label_col
-        new_cols = [scored_df.columns[-1], scored_df.index]
-        scored_df.set_index(new_cols, inplace=True)
+    # set scored df times outside of start and end to be 0
+    outside = (position <= first[group]) | (position >= last[group])
+    scores[outside] = 0
+    scored_df = pd.DataFrame(scores, index=data.index,
+                             columns=activity.columns)
+    scored_df[ldr_label] = data[ldr_label]
 
     return scored_df
 
@@ -94,3 +132,647 @@ def alter_file_name(file_name,
         file_name.suffix
     new_file_path = file_name.parent / new_file_name
     os.rename(file_name, new_file_path)
+
+
+def score_windows(data, windows=(4, 8, 12), packbits=False):
+    """
+    Scores activity data as sleep for several window lengths in one pass.
+
+    Gives the same scores as `sleep_process` for each window, using a
+    single cumulative count of non-zero epochs per column instead of one
+    rolling sum per window, and stores them as int8 or packed bits.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Activity data, one column per subject.
+    windows : sequence of int, optional
+        Window lengths in epochs. Default is (4, 8, 12).
+    packbits : bool, optional
+        If True, returns the scores packed eight epochs to a byte, see
+        `unpack_scores`. Default is False.
+
+    Returns
+    -------
+    pd.DataFrame or dict
+        int8 scores with the index of `data` and columns indexed by window
+        and subject. If `packbits` is True, a dictionary with keys
+        "Packed" (uint8 array of shape (ceil(n_epochs / 8), n_columns)),
+        "Index" and "Columns".
+    """
+    values = data.values
+    n_epochs, n_cols = values.shape
+
+    # number of non-zero or missing epochs up to each point
+    active = np.zeros((n_epochs + 1, n_cols), dtype=np.int64)
+    np.cumsum(~(values == 0), axis=0, out=active[1:])
+
+    scores = np.zeros((n_epochs, len(windows) * n_cols), dtype=np.int8)
+    for pos, window in enumerate(windows):
+        if window > n_epochs:
+            continue
+        window_active = active[window:] - active[:-window]
+        scores[window - 1:, pos * n_cols:(pos + 1) * n_cols] = \
+            window_active == 0
+
+    columns = pd.MultiIndex.from_product(
+        [list(windows), data.columns], names=["window", "subject"])
+    if packbits:
+        return {"Packed": np.packbits(scores, axis=0),
+                "Index": data.index,
+                "Columns": columns}
+    return pd.DataFrame(scores, index=data.index, columns=columns)
+
+
+def unpack_scores(packed):
+    """
+    Restores scores packed by `score_windows` to an int8 DataFrame.
+
+    Parameters
+    ----------
+    packed : dict
+        Output of `score_windows` with `packbits=True`.
+
+    Returns
+    -------
+    pd.DataFrame
+        int8 scores indexed as `score_windows` returns them.
+    """
+    scores = np.unpackbits(
+        packed["Packed"], axis=0, count=len(packed["Index"]))
+    return pd.DataFrame(scores.astype(np.int8), index=packed["Index"],
+                        columns=packed["Columns"])
+
+
+def _windows(values, before, after):
+    """
+    Sliding windows around every epoch of every column.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Array of shape (n_epochs, n_columns).
+    before, after : int
+        Number of epochs before and after the centre epoch.
+
+    Returns
+    -------
+    np.ndarray
+        View of shape (n_epochs, n_columns, before + 1 + after), windows
+        running past either end of the data are padded with NaN.
+    """
+    padded = np.full((len(values) + before + after, values.shape[1]), np.nan)
+    padded[before:before + len(values)] = values
+    return sliding_window_view(padded, before + 1 + after, axis=0)
+
+
+def cole_kripke(data, weights=(106, 54, 58, 76, 230, 74, 67), scale=0.001,
+                rescore=True):
+    """
+    Scores activity data as sleep with the Cole-Kripke algorithm.
+
+    Each epoch is scored from a weighted sum of the activity in the four
+    epochs before it, itself and the two after it,
+    D = scale * sum(weights * activity), with D < 1 scored as sleep. All
+    columns are scored at once with a sliding window view.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Activity counts in 1 minute epochs, one column per subject.
+    weights : sequence of float, optional
+        Weights of epochs t-4 to t+2. Default is the zero crossing mode
+        weights of Cole et al. 1992.
+    scale : float, optional
+        Scale factor P. Default is 0.001.
+    rescore : bool, optional
+        If True, applies Webster's rescoring rules, see `webster_rescore`.
+        Default is True.
+
+    Returns
+    -------
+    pd.DataFrame
+        Scores with 1 for sleep and 0 for wake, epochs whose window
+        contains missing data or runs past the ends are scored 0.
+    """
+    windows = _windows(data.values.astype(float), 4, 2)
+    activity_index = scale * (windows @ np.asarray(weights, dtype=float))
+    scores = pd.DataFrame((activity_index < 1).astype(int),
+                          index=data.index, columns=data.columns)
+    if rescore:
+        scores = webster_rescore(scores)
+    return scores
+
+
+def sadeh(data, threshold=-4, max_count=300):
+    """
+    Scores activity data as sleep with the Sadeh algorithm.
+
+    PS = 7.601 - 0.065 * MW - 1.08 * NAT - 0.056 * SD - 0.703 * LG, where
+    MW is the mean and NAT the number of epochs with 50 <= counts < 100 in
+    the 11 epoch window centred on t, SD the standard deviation of epochs
+    t-5 to t and LG ln(counts + 1) at t. All columns are scored at once
+    with a sliding window view.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Activity counts in 1 minute epochs, one column per subject.
+    threshold : float, optional
+        Epochs with PS above this are scored as sleep. Default is -4.
+    max_count : float, optional
+        Counts are capped at this value first. Default is 300.
+
+    Returns
+    -------
+    pd.DataFrame
+        Scores with 1 for sleep and 0 for wake, epochs whose window
+        contains missing data or runs past the ends are scored 0.
+    """
+    values = np.minimum(data.values.astype(float), max_count)
+    windows = _windows(values, 5, 5)
+    mean_window = windows.mean(axis=-1)
+    n_active = ((windows >= 50) & (windows < 100)).sum(axis=-1)
+    std_before = windows[..., :6].std(axis=-1, ddof=1)
+    log_activity = np.log(values + 1)
+
+    ps = 7.601 - 0.065 * mean_window - 1.08 * n_active \
+        - 0.056 * std_before - 0.703 * log_activity
+    return pd.DataFrame((ps > threshold).astype(int), index=data.index,
+                        columns=data.columns)
+
+
+def webster_rescore(scores):
+    """
+    Applies Webster's rescoring rules to sleep scores of 1 minute epochs.
+
+    a) after at least 4 minutes of wake the next minute of sleep is wake,
+    b) after at least 10 minutes of wake the next 3 minutes are wake,
+    c) after at least 15 minutes of wake the next 4 minutes are wake,
+    d) sleep of up to 6 minutes between at least 10 minutes of wake on
+    each side is wake, e) sleep of up to 10 minutes between at least 20
+    minutes of wake on each side is wake. The rules are applied to the
+    original scores of all columns at once using the runs of sleep and
+    wake.
+
+    Parameters
+    ----------
+    scores : pd.DataFrame
+        Scores with 1 for sleep and 0 for wake.
+
+    Returns
+    -------
+    pd.DataFrame
+        The rescored data.
+    """
+    sleep = scores.values == 1
+    n_epochs, n_cols = sleep.shape
+    wake_cols, wake_starts, wake_ends = _run_bounds(~sleep)
+    sleep_cols, sleep_starts, sleep_ends = _run_bounds(sleep)
+    wake_len = wake_ends - wake_starts
+    sleep_len = sleep_ends - sleep_starts
+
+    # rules a-c, the epochs after each long wake run
+    after_wake = np.select(
+        [wake_len >= 15, wake_len >= 10, wake_len >= 4], [4, 3, 1], 0)
+
+    # rules d-e, the wake runs either side of each sleep run
+    wake_before = np.zeros((n_cols, n_epochs + 1), dtype=int)
+    wake_after = np.zeros((n_cols, n_epochs + 1), dtype=int)
+    wake_before[wake_cols, wake_ends] = wake_len
+    wake_after[wake_cols, wake_starts] = wake_len
+    before = wake_before[sleep_cols, sleep_starts]
+    after = wake_after[sleep_cols, sleep_ends]
+    isolated = ((sleep_len <= 6) & (before >= 10) & (after >= 10)) | \
+        ((sleep_len <= 10) & (before >= 20) & (after >= 20))
+
+    # mark every rescored interval and fill in with a cumulative sum
+    change = np.zeros((n_epochs + 1, n_cols), dtype=int)
+    np.add.at(change, (wake_ends, wake_cols), 1)
+    np.add.at(change, (np.minimum(wake_ends + after_wake, n_epochs),
+                       wake_cols), -1)
+    np.add.at(change, (sleep_starts[isolated], sleep_cols[isolated]), 1)
+    np.add.at(change, (sleep_ends[isolated], sleep_cols[isolated]), -1)
+    to_wake = np.cumsum(change, axis=0)[:-1] > 0
+
+    return pd.DataFrame((sleep & ~to_wake).astype(int), index=scores.index,
+                        columns=scores.columns)
+
+
+# scorers available by name in `create_scored_df`
+SCORERS = {"window": sleep_process,
+           "cole_kripke": cole_kripke,
+           "sadeh": sadeh}
+
+
+def _get_scorer(scorer):
+    """
+    Looks up a scorer by name, callables are returned unchanged.
+    """
+    if callable(scorer):
+        return scorer
+    if scorer not in SCORERS:
+        raise ValueError(f"scorer must be callable or one of "
+                         f"{list(SCORERS)}, not {scorer!r}.")
+    return SCORERS[scorer]
+
+
+def _atomic_write(path, write):
+    """
+    Writes a file through a temporary file in the same directory, then
+    renames it, so readers never see a partial file.
+
+    Parameters
+    ----------
+    path : Path
+        Destination file.
+    write : callable
+        Called with the temporary file path to write the contents.
+    """
+    handle, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    os.close(handle)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _score_file(input_path, output_path, read_kwargs, score_kwargs):
+    """
+    Reads, scores and writes a single recording, kept at module level so
+    it can be sent to worker processes.
+    """
+    data = pd.read_csv(input_path, **read_kwargs)
+    scored = create_scored_df(data, **score_kwargs)
+    _atomic_write(output_path, scored.to_csv)
+    return output_path
+
+
+def _file_hash(path, settings):
+    """
+    Hash of the contents of a file together with the scoring settings.
+    """
+    digest = hashlib.blake2b(settings.encode(), digest_size=20)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def score_directory(path, pattern="*.csv", suffix="_sleep", n_jobs=None,
+                    manifest="sleep_manifest.json", read_kwargs=None,
+                    **kwargs):
+    """
+    Scores every recording in a directory for sleep in a process pool.
+
+    Each file is read with `pd.read_csv`, scored with `create_scored_df`
+    and written next to the input with `suffix` added to its name. A
+    manifest of input hashes is kept so files that have not changed since
+    they were last scored, with the same settings, are skipped.
+
+    Parameters
+    ----------
+    path : str or Path
+        Directory of recordings, or a glob pattern matching them.
+    pattern : str, optional
+        Glob pattern of recordings inside a directory. Default is "*.csv".
+    suffix : str, optional
+        Added to the file name of each scored output. Inputs whose name
+        already ends with it are ignored. Default is "_sleep".
+    n_jobs : int, optional
+        Number of worker processes, 1 runs in the current process. Default
+        is None, which lets the pool decide.
+    manifest : str, optional
+        File name of the manifest, kept in the directory of the first
+        recording. Default is "sleep_manifest.json".
+    read_kwargs : dict, optional
+        Passed to `pd.read_csv`. Default reads the first two columns as a
+        (label, time) index with parsed dates, the layout
+        `create_scored_df` expects.
+    **kwargs
+        Passed to `create_scored_df`, e.g. `scorer` or `ldr_col`.
+
+    Returns
+    -------
+    dict
+        A dictionary with the following keys:
+            - "Scored" : list of Path
+                Outputs written in this run.
+            - "Skipped" : list of Path
+                Outputs of unchanged recordings that were not rescored.
+    """
+    if read_kwargs is None:
+        read_kwargs = {"index_col": [0, 1], "parse_dates": True}
+
+    path = Path(path)
+    if path.is_dir():
+        inputs = sorted(path.glob(pattern))
+    else:
+        inputs = sorted(Path(match) for match in glob.glob(str(path)))
+    inputs = [file for file in inputs if not file.stem.endswith(suffix)]
+    if not inputs:
+        return {"Scored": [], "Skipped": []}
+
+    # the settings are part of every hash, so changing them rescores
+    settings = repr(sorted(
+        (key, f"{value.__module__}.{value.__qualname__}"
+         if callable(value) else value)
+        for key, value in {**kwargs, **read_kwargs}.items()))
+    manifest_path = inputs[0].parent / manifest
+    previous = {}
+    if manifest_path.exists():
+        with open(manifest_path) as file:
+            previous = json.load(file)
+
+    outputs = [file.parent / f"{file.stem}{suffix}{file.suffix}"
+               for file in inputs]
+    hashes = [_file_hash(file, settings) for file in inputs]
+    todo = [pos for pos, (file, output, digest) in enumerate(
+        zip(inputs, outputs, hashes))
+        if previous.get(str(file.resolve())) != digest
+        or not output.exists()]
+
+    jobs = [(inputs[pos], outputs[pos], read_kwargs, kwargs) for pos in todo]
+    if n_jobs == 1:
+        scored = [_score_file(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            scored = list(pool.map(_score_file, *zip(*jobs))) if jobs else []
+
+    # only record files once their output has been written
+    current = dict(previous)
+    current.update({str(inputs[pos].resolve()): hashes[pos] for pos in todo})
+    _atomic_write(manifest_path, lambda tmp_path: Path(tmp_path).write_text(
+        json.dumps(current, indent=2, sort_keys=True)))
+
+    skipped = [outputs[pos] for pos in
+               sorted(set(range(len(inputs))) - set(todo))]
+    return {"Scored": scored, "Skipped": skipped}
+
+
+def sleep_summary(scored, light_col=-1, light_val=150):
+    """
+    Sleep architecture per recording, subject, day and light phase.
+
+    Calculates total sleep, the number, mean and longest length of sleep
+    bouts and the latency to sleep after lights off for every subject of a
+    scored recording in one pass, using integer day and phase keys and
+    bincount reductions. Bouts are assigned to the day and phase in which
+    they start.
+
+    Parameters
+    ----------
+    scored : pd.DataFrame
+        Output of `create_scored_df`, with 1 for sleep and the light data in
+        one column. The index is either the time or (label, ..., time), in
+        which case each contiguous run of the leading levels is summarised
+        as a separate recording.
+    light_col : int, optional
+        Column number of the light data. Default is -1.
+    light_val : int, optional
+        The threshold at or above which the light is considered "on".
+        Default is 150.
+
+    Returns
+    -------
+    pd.DataFrame
+        Tidy table with a row for each subject, day and phase containing
+        columns "sleep" (total sleep in seconds), "bouts", "mean_bout",
+        "max_bout" (seconds) and "latency", the seconds from the first
+        lights off of the day to the next sleep epoch, given on the dark
+        row of each day with a lights off. For a MultiIndex the leading
+        levels are added as the first columns, named after the levels or
+        "label" if unnamed, and days are counted from each recording's
+        first midnight.
+    """
+    times = scored.index.get_level_values(-1)
+    light = scored.iloc[:, light_col].values
+    subjects = scored.drop(columns=scored.columns[light_col])
+    sleep = subjects.values == 1
+    n_epochs, n_subjects = sleep.shape
+
+    # contiguous blocks of rows from the same recording
+    if isinstance(scored.index, pd.MultiIndex):
+        leading = scored.index.droplevel(-1)
+        codes = pd.factorize(leading)[0]
+        group_starts = np.flatnonzero(np.diff(codes, prepend=-1) != 0)
+    else:
+        group_starts = np.array([0])
+    n_groups = len(group_starts)
+    group_ends = np.append(group_starts[1:], n_epochs)
+    group = np.repeat(np.arange(n_groups), group_ends - group_starts)
+    steps = np.diff(times.values)[np.diff(group) == 0]
+    epoch = np.median(steps) / np.timedelta64(1, "s")
+
+    # integer recording, day and phase key of every epoch
+    day = np.asarray(
+        (times - times[group_starts].normalize()[group]) // pd.Timedelta("1D"))
+    group_days = np.maximum.reduceat(day, group_starts) + 1
+    n_days = group_days.max()
+    phase = (light >= light_val).astype(int)
+    n_keys = n_groups * n_days * 2
+    epoch_key = (group * n_days + day) * 2 + phase
+
+    # total sleep per key
+    rows, cols = np.nonzero(sleep)
+    size = n_subjects * n_keys
+    sleep_epochs = np.bincount(cols * n_keys + epoch_key[rows],
+                               minlength=size)
+
+    # bouts from the shared run-length engine, with a wake row between
+    # recordings so bouts do not join across them
+    breaks = group_starts[1:]
+    padded = np.insert(sleep, breaks, False, axis=0)
+    bout_cols, bout_starts, bout_ends = _run_bounds(padded)
+    shift = np.searchsorted(breaks + np.arange(len(breaks)), bout_starts)
+    bout_starts = bout_starts - shift
+    bout_len = (bout_ends - shift - bout_starts) * epoch
+    bout_key = bout_cols * n_keys + epoch_key[bout_starts]
+    bouts = np.bincount(bout_key, minlength=size)
+    bout_total = np.bincount(bout_key, weights=bout_len, minlength=size)
+    max_bout = np.zeros(size)
+    np.maximum.at(max_bout, bout_key, bout_len)
+
+    # first lights off of each day and the next sleep epoch after it in
+    # the same recording
+    lights_off = np.flatnonzero((phase[1:] == 0) & (phase[:-1] == 1)
+                                & (group[1:] == group[:-1])) + 1
+    off_keys, first = np.unique(epoch_key[lights_off], return_index=True)
+    lights_off = lights_off[first]
+    sleep_pos = np.where(sleep, np.arange(n_epochs)[:, None], n_epochs)
+    next_sleep = np.minimum.accumulate(sleep_pos[::-1], axis=0)[::-1]
+    next_sleep = next_sleep[lights_off]
+    found = next_sleep < group_ends[group[lights_off]][:, None]
+    with np.errstate(invalid="ignore"):
+        off_latency = np.where(
+            found,
+            (times.values[np.minimum(next_sleep, n_epochs - 1)]
+             - times.values[lights_off][:, None]) / np.timedelta64(1, "s"),
+            np.nan)
+    latency = np.full(size, np.nan)
+    latency[(np.arange(n_subjects) * n_keys
+             + off_keys[:, None]).ravel()] = off_latency.ravel()
+
+    # rows for the days each recording covers
+    key = np.arange(size)
+    key_group = key % n_keys // (n_days * 2)
+    key_day = key % (n_days * 2) // 2
+    key = key[key_day < group_days[key_group]]
+    key = key[np.argsort(key_group[key], kind="stable")]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_bout = bout_total[key] / bouts[key]
+    summary = pd.DataFrame({
+        "subject": subjects.columns.values[key // n_keys],
+        "day": key % (n_days * 2) // 2,
+        "phase": np.where(key % 2, "light", "dark"),
+        "sleep": sleep_epochs[key] * epoch,
+        "bouts": bouts[key],
+        "mean_bout": mean_bout,
+        "max_bout": max_bout[key],
+        "latency": latency[key],
+    })
+
+    if isinstance(scored.index, pd.MultiIndex):
+        labels = leading[group_starts].to_frame(index=False)
+        labels.columns = [
+            name if name is not None else
+            ("label" if labels.shape[1] == 1 else f"level_{pos}")
+            for pos, name in enumerate(scored.index.names[:-1])]
+        labels = labels.iloc[key_group[key]].reset_index(drop=True)
+        summary = pd.concat([labels, summary], axis=1)
+
+    return summary
+
+
+class StreamingSleepScorer:
+    """
+    Scores activity for sleep as epochs arrive, for live recordings.
+
+    Keeps only the last `window - 1` epochs of each channel, so each chunk
+    is scored in time proportional to its length. Epochs at or after the
+    most recent activity above `threshold` are held back until later
+    activity confirms them, because `_score_active_times` sets everything
+    from the last activity onwards to 0. The concatenated output of
+    `update` and `flush` equals `_score_active_times(data,
+    drop_level=False, window=window)` on the whole recording.
+
+    Parameters
+    ----------
+    window : int, optional
+        Window length in epochs, as in `sleep_process`. Default is 4.
+    ldr_col : int, optional
+        Column number of the light data. Default is -1.
+    test_col : int, optional
+        Column, after removing the light data, used to find the start and
+        end of activity. Default is 0.
+    threshold : float, optional
+        Activity above this marks the recording as active. Default is 1.
+
+    Examples
+    --------
+    >>> scorer = StreamingSleepScorer()
+    >>> for chunk in chunks:
+    ...     scored = scorer.update(chunk)
+    >>> last = scorer.flush()
+    """
+
+    def __init__(self, window=4, ldr_col=-1, test_col=0, threshold=1):
+        self.window = window
+        self.ldr_col = ldr_col
+        self.test_col = test_col
+        self.threshold = threshold
+        self._history = None
+        self._n_seen = 0
+        self._started = False
+        self._columns = None
+        # held back epochs as (index, scores, light) chunks
+        self._pending = []
+
+    def _frame(self, chunks):
+        """
+        Builds the scored DataFrame of a list of (index, scores, light)
+        chunks.
+        """
+        index = chunks[0][0].append([chunk[0] for chunk in chunks[1:]])
+        scores = pd.DataFrame(
+            np.concatenate([chunk[1] for chunk in chunks]), index=index,
+            columns=self._columns[:-1])
+        scores[self._columns[-1]] = np.concatenate(
+            [chunk[2] for chunk in chunks])
+        return scores
+
+    def update(self, chunk):
+        """
+        Scores a chunk of new epochs.
+
+        Parameters
+        ----------
+        chunk : pd.DataFrame
+            New epochs in time order, with the same columns as the
+            recording, including the light data.
+
+        Returns
+        -------
+        pd.DataFrame
+            Scores of every epoch that can no longer change, with the light
+            data as the last column. May be empty.
+        """
+        ldr_label = chunk.columns[self.ldr_col]
+        activity = chunk.drop(columns=ldr_label)
+        self._columns = activity.columns.append(pd.Index([ldr_label]))
+
+        # rolling window over the kept history and the new epochs
+        not_still = ~(activity.values == 0)
+        if self._history is None:
+            self._history = np.zeros((0, not_still.shape[1]), dtype=bool)
+        combined = np.vstack([self._history, not_still])
+        counts = np.zeros((len(combined) + 1, combined.shape[1]), dtype=int)
+        np.cumsum(combined, axis=0, out=counts[1:])
+        offset = len(self._history)
+        ends = np.arange(offset, len(combined)) + 1
+        window_counts = counts[ends] - counts[np.maximum(ends - self.window,
+                                                         0)]
+        full = self._n_seen + np.arange(len(chunk)) >= self.window - 1
+        scores = ((window_counts == 0) & full[:, None]).astype(int)
+        light = chunk[ldr_label].values
+        self._history = combined[
+            max(len(combined) - (self.window - 1), 0):]
+        self._n_seen += len(chunk)
+
+        # everything up to and including the first activity is 0
+        active = (activity.iloc[:, self.test_col] > self.threshold).values
+        if not self._started and active.any():
+            scores[:np.argmax(active) + 1] = 0
+            self._started = True
+        if not self._started:
+            scores[:] = 0
+            return self._frame([(chunk.index, scores, light)])
+
+        # the held back epochs start at the previous last activity, so the
+        # new last activity is either in this chunk or at the first of them
+        if not active.any():
+            self._pending.append((chunk.index, scores, light))
+            return self._frame([(chunk.index[:0], scores[:0], light[:0])])
+        last = len(active) - 1 - np.argmax(active[::-1])
+        released = self._pending + [
+            (chunk.index[:last], scores[:last], light[:last])]
+        self._pending = [(chunk.index[last:], scores[last:], light[last:])]
+        return self._frame(released)
+
+    def flush(self):
+        """
+        Ends the recording, releasing the held back epochs as 0.
+
+        Returns
+        -------
+        pd.DataFrame
+            The remaining scores, may be empty.
+        """
+        if not self._pending:
+            return pd.DataFrame()
+        remaining = self._frame(self._pending)
+        remaining.iloc[:, :remaining.shape[1] - 1] = 0
+        self._pending = []
+        return remaining
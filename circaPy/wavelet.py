@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import circaPy.preprocessing as prep
+
+
+def _morlet_filter(omega, scales, omega0):
+    """
+    Fourier transform of analytic Morlet wavelets at several scales.
+
+    Normalised so that a cosine of amplitude A at the centre frequency of a
+    scale gives a wavelet coefficient of modulus A.
+
+    Parameters
+    ----------
+    omega : np.ndarray
+        Angular frequencies of the FFT bins, in rad/s.
+    scales : np.ndarray
+        Wavelet scales, in seconds.
+    omega0 : float
+        Non-dimensional centre frequency of the mother wavelet.
+
+    Returns
+    -------
+    np.ndarray
+        Filters of shape (len(scales), len(omega)), zero at negative
+        frequencies.
+    """
+    arg = np.outer(scales, omega) - omega0
+    return 2 * np.exp(-0.5 * arg * arg) * (omega > 0)
+
+
+@prep.validate_input
+def wavelet_period(data, low_period=20, high_period=30, n_scales=50,
+                   omega0=6, scale_block=10, max_memory=2 ** 29, **kwargs):
+    """
+    Tracks period and amplitude over time for every column with a Morlet
+    continuous wavelet transform.
+
+    The transform is computed by FFT convolution on blocks of columns and
+    scales sized to fit in `max_memory`, and only the running ridge, the
+    scale of maximum modulus at each time point, is kept, so memory does not
+    grow with `n_scales` or the number of columns.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Evenly sampled time-series data. The index represents time, and the
+        columns contain observations.
+    low_period : float, optional
+        The shortest period to track, in hours. Default is 20.
+    high_period : float, optional
+        The longest period to track, in hours. Default is 30.
+    n_scales : int, optional
+        Number of periods between `low_period` and `high_period`.
+        Default is 50.
+    omega0 : float, optional
+        Centre frequency of the Morlet wavelet, larger values give finer
+        period resolution and coarser time resolution. Default is 6.
+    scale_block : int, optional
+        Largest number of scales transformed together. Default is 10.
+    max_memory : int, optional
+        Approximate limit in bytes for the FFT workspace, the number of
+        columns and scales per block are reduced to stay within it.
+        Default is 2 ** 29 (512 MB).
+
+    Returns
+    -------
+    dict
+        A dictionary with the following keys, each a pd.DataFrame with the
+        index of `data` and a column per subject:
+            - "Period" : period of the ridge at each time point, in hours.
+            - "Amplitude" : amplitude of the rhythm at that period.
+            - "Power" : squared amplitude.
+
+    Raises
+    ------
+    ValueError
+        If `low_period` is greater than or equal to `high_period`.
+
+    Notes
+    -----
+    - Values within about one period of the start and end of the recording
+      are affected by the edges and should be interpreted with care.
+    - NaN samples are set to the column mean before transforming.
+    - The FFT workspace of a block takes about 16 * n_fft * n_block_cols *
+      (2 * n_block_scales + 1) bytes, where n_fft is the smallest power of
+      two of at least twice the number of samples. At least one column and
+      one scale are transformed at a time, so the peak can exceed
+      `max_memory` for very long recordings. The outputs add about
+      5 * 8 bytes per sample and column.
+    """
+    # Validate periods
+    if low_period >= high_period:
+        raise ValueError(f"low_period ({low_period}) must be less than"
+                         f"high_period ({high_period}).")
+
+    sample_freq = pd.Timedelta(pd.tseries.frequencies.to_offset(
+        pd.infer_freq(data.index))).total_seconds()
+
+    # centre and zero pad so the convolution does not wrap around
+    values = data.values.astype(float)
+    values = np.nan_to_num(values - np.nanmean(values, axis=0))
+    n_samples, n_cols = values.shape
+    n_fft = 1 << int(np.ceil(np.log2(2 * n_samples)))
+    omega = 2 * np.pi * np.fft.fftfreq(n_fft, d=sample_freq)
+
+    # scale whose centre frequency is each test period
+    periods = np.linspace(low_period, high_period, n_scales)
+    scales = omega0 * periods * 3600 / (2 * np.pi)
+
+    # size the blocks so the complex workspace stays within max_memory,
+    # the spectrum plus the product and transform of each scale
+    column_bytes = 16 * n_fft
+    scale_block = int(min(scale_block, max(
+        1, (max_memory // column_bytes - 1) // 2)))
+    col_block = int(max(1, max_memory // (column_bytes *
+                                          (2 * scale_block + 1))))
+
+    best_amp = np.full((n_cols, n_samples), -np.inf)
+    best_scale = np.zeros((n_cols, n_samples), dtype=int)
+    for col_start in range(0, n_cols, col_block):
+        cols = slice(col_start, col_start + col_block)
+        spectrum = np.fft.fft(values[:, cols], n=n_fft, axis=0).T
+        for start in range(0, n_scales, scale_block):
+            block = slice(start, start + scale_block)
+            filters = _morlet_filter(omega, scales[block], omega0)
+            coefs = np.fft.ifft(spectrum[:, None, :] * filters[None],
+                                axis=-1)
+            amp = np.abs(coefs[..., :n_samples])
+
+            # keep the running ridge only
+            block_best = amp.argmax(axis=1)
+            block_amp = np.take_along_axis(
+                amp, block_best[:, None, :], axis=1)[:, 0]
+            better = block_amp > best_amp[cols]
+            best_amp[cols][better] = block_amp[better]
+            best_scale[cols][better] = block_best[better] + start
+
+    period = pd.DataFrame(periods[best_scale].T, index=data.index,
+                          columns=data.columns)
+    amplitude = pd.DataFrame(best_amp.T, index=data.index,
+                             columns=data.columns)
+
+    return {"Period": period, "Amplitude": amplitude,
+            "Power": amplitude ** 2}
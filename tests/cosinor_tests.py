@@ -0,0 +1,105 @@
+import unittest
+import sys
+import os
+import numpy as np
+import pandas as pd
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+if True:  # noqa E402
+    from circaPy.cosinor import fit_cosinor, fit_cosinor_windowed
+
+
+def generate_cosine_data(days=6, freq="10min", start="2000-01-01 06:00"):
+    """
+    Generate noisy cosine data with known mesor, amplitude and acrophase.
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns "a" (mesor 5, amplitude 3, peak at 14:00) and "b" (mesor 2,
+        amplitude 1, peak at 03:00).
+    """
+    index = pd.date_range(start=start, periods=days * 144, freq=freq)
+    hours = (index - index[0].normalize()).total_seconds() / 3600
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        "a": 5 + 3 * np.cos(2 * np.pi * (hours - 14) / 24)
+        + rng.normal(0, 1, len(index)),
+        "b": 2 + np.cos(2 * np.pi * (hours - 3) / 24)
+        + rng.normal(0, 0.5, len(index)),
+    }, index=index)
+
+
+class TestFitCosinor(unittest.TestCase):
+
+    def setUp(self):
+        self.data = generate_cosine_data()
+
+    def test_recovers_parameters(self):
+        """Test mesor, amplitude and acrophase are recovered."""
+        result = fit_cosinor(self.data)
+        np.testing.assert_allclose(result["Mesor"], [5, 2], atol=0.1)
+        np.testing.assert_allclose(result["Amplitude_1"], [3, 1], atol=0.1)
+        np.testing.assert_allclose(result["Acrophase_1"], [14, 3], atol=0.3)
+        self.assertTrue((result["R2"] > 0.5).all())
+
+    def test_matches_column_fit(self):
+        """Test the shared solve matches fitting one column at a time."""
+        result = fit_cosinor(self.data, n_components=2)
+        single = fit_cosinor(self.data[["b"]], n_components=2)
+        pd.testing.assert_series_equal(result.loc["b"], single.loc["b"])
+
+    def test_standard_errors(self):
+        """Test standard errors match the ordinary least squares formula."""
+        result = fit_cosinor(self.data)
+        hours = np.asarray((self.data.index - self.data.index[0].normalize())
+                           .total_seconds() / 3600)
+        x = np.column_stack([np.ones(len(hours)),
+                             np.cos(2 * np.pi * hours / 24),
+                             np.sin(2 * np.pi * hours / 24)])
+        y = self.data["a"].values
+        beta = np.linalg.lstsq(x, y, rcond=None)[0]
+        sigma2 = ((y - x @ beta) ** 2).sum() / (len(y) - 3)
+        se = np.sqrt(np.diag(sigma2 * np.linalg.inv(x.T @ x)))
+        self.assertAlmostEqual(result.loc["a", "Mesor_SE"], se[0])
+
+    def test_nan_values(self):
+        """Test NaNs are left out of the fit of their column only."""
+        data = self.data.copy()
+        data.iloc[10:50, 1] = np.nan
+        result = fit_cosinor(data)
+        expected = fit_cosinor(data[["b"]].dropna())
+        pd.testing.assert_series_equal(result.loc["b"], expected.loc["b"])
+        pd.testing.assert_series_equal(
+            result.loc["a"], fit_cosinor(self.data).loc["a"])
+
+    def test_invalid_period(self):
+        """Test a non-positive period raises an error."""
+        with self.assertRaises(ValueError):
+            fit_cosinor(self.data, period=0)
+
+
+class TestFitCosinorWindowed(unittest.TestCase):
+
+    def setUp(self):
+        self.data = generate_cosine_data()
+
+    def test_one_fit_per_day(self):
+        """Test each window matches fitting that day on its own."""
+        result = fit_cosinor_windowed(self.data)
+        self.assertEqual(len(result), 2 * 6)
+        day = self.data.iloc[144:288]
+        expected = fit_cosinor(day)
+        start = self.data.index[144]
+        pd.testing.assert_frame_equal(
+            result.xs(start, level="window_start"), expected,
+            check_names=False)
+
+    def test_window_too_long(self):
+        """Test a window longer than the data raises an error."""
+        with self.assertRaises(ValueError):
+            fit_cosinor_windowed(self.data, window="10D")
+
+
+if __name__ == "__main__":
+    unittest.main()
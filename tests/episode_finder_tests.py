@@ -8,7 +8,9 @@ import datetime
 sys.path.insert(
     0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 if True:  # noqa E402
-    from circaPy.episodes import find_episodes
+    from circaPy.episodes import find_episodes, EpisodeIndex, \
+        light_phase_windows, find_episodes_threshold, episode_summary, \
+        bout_survival, transition_probabilities, episode_parameter_sweep
 
 
 class TestFindEpisodes(unittest.TestCase):
@@ -111,5 +113,196 @@ class TestFindEpisodes(unittest.TestCase):
         )
 
 
+class TestEpisodeParameterSweep(unittest.TestCase):
+
+    def setUp(self):
+        index = pd.date_range("2024-01-01", periods=500, freq="10s")
+        np.random.seed(42)
+        self.data = pd.DataFrame({
+            "Subject 1": np.random.choice([0, 10], size=500, p=[0.5, 0.5])
+        }, index=index)
+
+    def test_matches_find_episodes(self):
+        min_lengths = ["1s", "20s", "1min"]
+        max_interruptions = ["0s", "10s", "30s", "100s"]
+        sweep = episode_parameter_sweep(
+            self.data,
+            min_lengths=min_lengths,
+            max_interruptions=max_interruptions)
+        self.assertEqual(len(sweep), 12)
+        for max_interruption in max_interruptions:
+            for min_length in min_lengths:
+                episodes = find_episodes(
+                    self.data,
+                    min_length=min_length,
+                    max_interruption=max_interruption)
+                row = sweep.loc[(max_interruption, min_length)]
+                self.assertEqual(row["count"], len(episodes))
+                self.assertAlmostEqual(row["total"], episodes.sum())
+
+
+class TestEpisodeIndex(unittest.TestCase):
+
+    def setUp(self):
+        index = pd.date_range("2024-01-01", periods=50, freq="10s")
+        data = pd.DataFrame({
+            "Subject 1": [0, 0, 10, 0, 0, 0, 10, 10, 0, 0] * 5,
+        }, index=index)
+        self.episodes = find_episodes(data, subject_no=0)
+        self.ep_index = EpisodeIndex(self.episodes)
+
+    def test_round_trip(self):
+        pd.testing.assert_series_equal(
+            self.ep_index.to_series(), self.episodes, check_freq=False)
+
+    def test_overlapping(self):
+        # episode at 00:01:00 lasts 20s so overlaps a window from 00:01:10
+        result = self.ep_index.overlapping(
+            "2024-01-01 00:01:10", "2024-01-01 00:02:10")
+        self.assertEqual(list(result.values), [20, 10])
+
+    def test_started_between(self):
+        result = self.ep_index.started_between(
+            "2024-01-01 00:01:10", "2024-01-01 00:02:10")
+        self.assertEqual(list(result.values), [10])
+
+    def test_bulk_queries(self):
+        starts = pd.to_datetime(["2024-01-01 00:00:00",
+                                 "2024-01-01 00:01:10",
+                                 "2024-01-01 01:00:00"])
+        ends = starts + pd.Timedelta("1min")
+        np.testing.assert_array_equal(
+            self.ep_index.count(starts, ends), [1, 2, 0])
+        np.testing.assert_array_equal(
+            self.ep_index.total(starts, ends), [10, 20, 0])
+
+    def test_by_phase(self):
+        index = pd.date_range("2024-01-01", periods=48, freq="h")
+        light = pd.Series(np.where(index.hour < 12, 500, 0), index=index)
+        windows = light_phase_windows(light)
+        self.assertEqual(list(windows["phase"]), [1, 0, 1, 0])
+        self.assertEqual(list(windows["day"]), [0, 0, 1, 1])
+        result = self.ep_index.by_phase(light)
+        self.assertEqual(result["count"].sum(), len(self.episodes))
+        self.assertEqual(result["total"].sum(), self.episodes.sum())
+
+
+class TestFindEpisodesThreshold(unittest.TestCase):
+
+    def setUp(self):
+        self.index = pd.date_range("2024-01-01", periods=50, freq="10s")
+        self.data = pd.DataFrame({
+            "Subject 1": [0, 0, 10, 0, 0, 0, 10, 10, 0, 0] * 5,
+            "Subject 2": [0, 10, 0, 10, 10, 0, 0, 0, 10, 0] * 5
+        }, index=self.index)
+
+    def test_zero_threshold_matches_find_episodes(self):
+        episodes = find_episodes_threshold(self.data)
+        for subject_no, col in enumerate(self.data.columns):
+            expected = find_episodes(self.data, subject_no=subject_no)
+            np.testing.assert_array_equal(
+                episodes[col].dropna().values, expected.values)
+            np.testing.assert_array_equal(
+                episodes[col].dropna().index, expected.index)
+
+    def test_hysteresis(self):
+        # noisy low values only end inactivity once they pass high
+        index = pd.date_range("2024-01-01", periods=12, freq="10s")
+        data = pd.DataFrame(
+            {"Subject 1": [9, 1, 0, 1, 4, 2, 8, 1, 0, 0, 9, 9]},
+            index=index)
+        episodes = find_episodes_threshold(
+            data, low=1, high=5, min_epochs=2, inactive_episodes=True)
+        expected_index = index[[1, 7]]
+        np.testing.assert_array_equal(episodes.index, expected_index)
+        np.testing.assert_array_equal(episodes["Subject 1"], [50, 30])
+
+    def test_high_below_low(self):
+        with self.assertRaises(ValueError):
+            find_episodes_threshold(self.data, low=5, high=1)
+
+
+class TestEpisodeSummary(unittest.TestCase):
+
+    def setUp(self):
+        # two days of hourly data, lights on for the first 12 hours
+        self.index = pd.date_range("2024-01-01", periods=48, freq="h")
+        self.light = pd.Series(
+            np.where(self.index.hour < 12, 500, 0), index=self.index)
+        self.episodes = pd.DataFrame({
+            "Subject 1": [60, 120, 300, np.nan],
+            "Subject 2": [np.nan, 30, np.nan, 90],
+        }, index=self.index[[1, 2, 13, 30]])
+
+    def test_summary_values(self):
+        summary = episode_summary(self.episodes, light_data=self.light)
+        first = summary.iloc[1]
+        self.assertEqual(
+            (first["subject"], first["day"], first["phase"]),
+            ("Subject 1", 0, "light"))
+        self.assertEqual(first["count"], 2)
+        self.assertEqual(first["mean"], 90)
+        self.assertEqual(first["median"], 90)
+        self.assertEqual(first["max"], 120)
+        self.assertEqual(first["total"], 180)
+        self.assertEqual(first["fragmentation"], 40)
+        self.assertEqual(len(summary), 4)
+        self.assertEqual(summary["count"].sum(), 5)
+
+    def test_no_light_data(self):
+        summary = episode_summary(self.episodes)
+        self.assertNotIn("phase", summary.columns)
+        self.assertEqual(list(summary["day"]), [0, 0, 1])
+
+    def test_episode_before_light_data(self):
+        episodes = pd.DataFrame({
+            "Subject 1": [60, np.nan],
+            "Subject 2": [np.nan, 30],
+        }, index=[pd.Timestamp("2023-12-31 20:00"), self.index[5]])
+        summary = episode_summary(episodes, light_data=self.light)
+        self.assertEqual(list(summary["subject"]), ["Subject 2"])
+        self.assertEqual(summary["total"].iloc[0], 30)
+        self.assertEqual(summary["phase"].iloc[0], "light")
+
+    def test_no_episodes(self):
+        empty = self.episodes.iloc[:0]
+        columns = ["subject", "day", "phase", "count", "mean", "median",
+                   "max", "total", "fragmentation"]
+        summary = episode_summary(empty, light_data=self.light)
+        self.assertTrue(summary.empty)
+        self.assertEqual(list(summary.columns), columns)
+        summary = episode_summary(empty)
+        self.assertTrue(summary.empty)
+        self.assertEqual(list(summary.columns),
+                         [col for col in columns if col != "phase"])
+
+
+class TestBoutSurvival(unittest.TestCase):
+
+    def setUp(self):
+        index = pd.date_range("2024-01-01", periods=5, freq="h")
+        self.episodes = pd.DataFrame({
+            "Subject 1": [10, 20, 10, 30, np.nan],
+            "Subject 2": [20, np.nan, 20, np.nan, 40],
+        }, index=index)
+
+    def test_survival_curve(self):
+        survival = bout_survival(self.episodes)
+        subject_1 = survival[survival["subject"] == "Subject 1"]
+        np.testing.assert_array_equal(subject_1["duration"], [10, 20, 30])
+        np.testing.assert_array_equal(subject_1["n_bouts"], [2, 1, 1])
+        np.testing.assert_array_equal(subject_1["at_risk"], [4, 2, 1])
+        np.testing.assert_array_equal(subject_1["survival"], [0.5, 0.25, 0])
+        np.testing.assert_array_equal(subject_1["hazard"], [0.5, 0.5, 1])
+        subject_2 = survival[survival["subject"] == "Subject 2"]
+        np.testing.assert_array_equal(subject_2["at_risk"], [3, 1])
+
+    def test_transition_probabilities(self):
+        result = transition_probabilities(self.episodes, self.episodes)
+        self.assertEqual(set(result["transition"]), {"kRA", "kAR"})
+        self.assertIn("probability", result.columns)
+        self.assertEqual(len(result), 10)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import sys
+import os
+import itertools
+import numpy as np
+import pandas as pd
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+if True:  # noqa E402
+    from circaPy.hmm import hmm_states, _forward_backward, _log_emissions, \
+        _viterbi
+    from circaPy.episodes import episodes_from_mask
+
+
+def simulate_rest_activity(n_epochs=2880, n_subjects=3, switch=0.02,
+                           seed=0):
+    """
+    Simulate counts from a two state Markov chain, low counts at rest and
+    high counts when active.
+
+    Returns
+    -------
+    tuple
+        The true states and a DataFrame of counts, one column per subject.
+    """
+    rng = np.random.default_rng(seed)
+    flips = rng.random((n_epochs, n_subjects)) < switch
+    states = np.cumsum(flips, axis=0) % 2
+    counts = np.where(states == 0, rng.poisson(0.3, states.shape),
+                      rng.poisson(40, states.shape))
+    index = pd.date_range("2000-01-01", periods=n_epochs, freq="1min")
+    columns = [f"sensor{i + 1}" for i in range(n_subjects)]
+    return (pd.DataFrame(states, index=index, columns=columns),
+            pd.DataFrame(counts.astype(float), index=index, columns=columns))
+
+
+class TestHMMPasses(unittest.TestCase):
+
+    def setUp(self):
+        """A tiny model where every path can be enumerated."""
+        self.log_start = np.log([[0.6, 0.4]])
+        self.log_trans = np.log([[[0.8, 0.2], [0.3, 0.7]]])
+        x = np.array([[0.1], [2.0], [np.nan], [1.5]])
+        self.log_b = _log_emissions(
+            x, np.array([[0.0, 2.0]]), np.array([[1.0, 1.0]]))
+        self.paths = {}
+        for path in itertools.product([0, 1], repeat=4):
+            log_p = self.log_start[0, path[0]] + self.log_b[0, 0, path[0]]
+            for t in range(1, 4):
+                log_p += self.log_trans[0, path[t - 1], path[t]] + \
+                    self.log_b[t, 0, path[t]]
+            self.paths[path] = log_p
+
+    def test_likelihood(self):
+        """Test the forward pass against summing over every path."""
+        *_, log_likelihood = _forward_backward(
+            self.log_start, self.log_trans, self.log_b)
+        expected = np.log(np.exp(list(self.paths.values())).sum())
+        self.assertAlmostEqual(log_likelihood[0], expected)
+
+    def test_viterbi(self):
+        """Test the Viterbi path is the most likely path."""
+        path = _viterbi(self.log_start, self.log_trans, self.log_b)
+        best = max(self.paths, key=self.paths.get)
+        np.testing.assert_array_equal(path[:, 0], best)
+
+    def test_missing_emission(self):
+        """Test a missing observation does not favour any state."""
+        np.testing.assert_array_equal(self.log_b[2], 0)
+
+
+class TestHMMStates(unittest.TestCase):
+
+    def setUp(self):
+        self.states, self.data = simulate_rest_activity()
+
+    def test_recovers_states(self):
+        """Test the decoded states match the simulated states."""
+        result = hmm_states(self.data)
+        accuracy = (result["States"] == self.states).values.mean()
+        self.assertGreater(accuracy, 0.99)
+        self.assertTrue(
+            (result["Means"][0] < result["Means"][1]).all())
+
+    def test_output_structure(self):
+        """Test posteriors sum to one and transitions are stochastic."""
+        result = hmm_states(self.data, n_states=3, n_iter=10)
+        posterior = result["Posterior"]
+        self.assertEqual(posterior.shape, (len(self.data), 9))
+        np.testing.assert_allclose(
+            posterior.T.groupby(level=0).sum().values, 1)
+        np.testing.assert_allclose(result["Transition"].sum(axis=1), 1)
+        self.assertEqual(result["Log_likelihood"].shape, (3,))
+
+    def test_nan_epochs(self):
+        """Test NaN epochs are decoded without affecting other columns."""
+        data = self.data.copy()
+        data.iloc[100:110, 0] = np.nan
+        result = hmm_states(data)
+        self.assertFalse(result["States"].isna().any().any())
+        accuracy = (result["States"] == self.states).values.mean()
+        self.assertGreater(accuracy, 0.99)
+
+    def test_rest_episodes(self):
+        """Test rest states convert to episodes."""
+        result = hmm_states(self.data)
+        episodes = episodes_from_mask(result["States"] == 0)
+        self.assertEqual(list(episodes.columns), list(self.data.columns))
+        self.assertTrue((episodes.dropna(how="all") > 0).any().all())
+
+    def test_invalid_states(self):
+        with self.assertRaises(ValueError):
+            hmm_states(self.data, n_states=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
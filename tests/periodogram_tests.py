@@ -1,14 +1,20 @@
 import unittest
 import sys
 import os
+import tempfile
+from unittest import mock
 import pdb
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from astropy.timeseries import LombScargle
 sys.path.insert(
     0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 if True:  # noqa E402
-    from circaPy.periodogram import lomb_scargle_period
+    from circaPy.periodogram import lomb_scargle_period, lomb_scargle_batch, \
+        chi_square_period, lomb_scargle_windowed, lomb_scargle_significance, \
+        autocorrelation_period, enable_cache, disable_cache
+    import circaPy.periodogram as periodogram
     from circaPy.preprocessing import set_circadian_time
     from tests.activity_tests import assign_values, generate_test_data
 
@@ -64,6 +70,15 @@ class TestLombScarglePeriod(unittest.TestCase):
         result = lomb_scargle_period(constant_data, subject_no=0)
         self.assertTrue(result["Pmax"] < 0.1)
 
+    def test_gaps_and_nans(self):
+        """Test dropouts and NaNs do not need resampling first."""
+        data = self.data.drop(self.data.index[5000:20000])
+        data.iloc[30000:31000, 0] = np.nan
+        result = lomb_scargle_period(data, subject_no=0)
+        self.assertEqual(24, np.round(result["Period"]))
+        adaptive = lomb_scargle_period(data, subject_no=0, adaptive=True)
+        self.assertAlmostEqual(adaptive["Period"], result["Period"], places=1)
+
     def test_power_values_structure(self):
         """Test that Power_values is a non-empty pd.Series with the correct index."""
         result = lomb_scargle_period(
@@ -90,5 +105,334 @@ class TestLombScarglePeriod(unittest.TestCase):
         self.assertTrue(result["Period"] < 21)
 
 
+class TestLombScargleBatch(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test data using `generate_test_data`."""
+        self.data = generate_test_data(days=10, freq="10s")
+
+    def test_matches_astropy(self):
+        """Test power matches astropy's exact method for every column."""
+        result = lomb_scargle_batch(self.data, n_periods=200)
+        freq = np.linspace(1 / (30 * 3600), 1 / (20 * 3600), 200)
+        times = np.arange(len(self.data)) * 10
+        for col in self.data.columns:
+            expected = LombScargle(times, self.data[col].values).power(
+                freq, method="cython")
+            expected = pd.Series(expected, index=1 / (freq * 3600))
+            np.testing.assert_allclose(
+                result["Power_values"][col].values,
+                expected.sort_index().values, atol=1e-8)
+
+    def test_output_structure(self):
+        """Test the output has a row per period and a column per subject."""
+        result = lomb_scargle_batch(self.data)
+        power_values = result["Power_values"]
+        self.assertEqual(power_values.shape, (10000, len(self.data.columns)))
+        self.assertTrue(power_values.index.is_monotonic_increasing)
+        np.testing.assert_array_equal(
+            np.round(result["Period"][:-1]), [24, 24, 24])
+
+    def test_astropy_method(self):
+        """Test the thread pool fallback finds the same periods."""
+        result = lomb_scargle_batch(self.data, method="astropy")
+        expected = lomb_scargle_period(self.data, subject_no=0)
+        self.assertAlmostEqual(result["Period"].iloc[0], expected["Period"])
+
+    def test_nan_column(self):
+        """Test NaNs are left out of their own column only."""
+        data = self.data.copy()
+        data.iloc[:500, 0] = np.nan
+        data.iloc[:, 2] = np.nan
+        result = lomb_scargle_batch(data, n_periods=200)
+        freq = np.linspace(1 / (30 * 3600), 1 / (20 * 3600), 200)
+        times = np.arange(500, len(data)) * 10
+        expected = LombScargle(times, data.iloc[500:, 0].values).power(
+            freq, method="cython")
+        np.testing.assert_allclose(
+            result["Power_values"].iloc[:, 0].values, expected[::-1],
+            atol=1e-8)
+        self.assertTrue(np.isnan(result["Pmax"].iloc[2]))
+        self.assertFalse(np.isnan(result["Period"].iloc[1]))
+
+    def test_gaps_in_index(self):
+        """Test dropped samples use the real timestamps."""
+        data = self.data.resample("10min").mean()
+        gappy = data.drop(data.index[100:400])
+        result = lomb_scargle_batch(gappy, n_periods=200)
+        filled = lomb_scargle_batch(data.where(gappy.notna().reindex(
+            data.index, fill_value=False)), n_periods=200)
+        pd.testing.assert_frame_equal(
+            result["Power_values"], filled["Power_values"])
+
+    def test_irregular_timestamps(self):
+        """Test timestamps off a regular grid fall back to astropy."""
+        data = self.data.resample("10min").mean()
+        jitter = np.random.default_rng(0).uniform(0, 60, len(data))
+        data.index = data.index + pd.to_timedelta(jitter, unit="s")
+        result = lomb_scargle_batch(data, n_periods=200)
+        np.testing.assert_array_equal(
+            np.round(result["Period"][:-1]), [24, 24, 24])
+
+    def test_invalid_method(self):
+        with self.assertRaises(ValueError):
+            lomb_scargle_batch(self.data, method="fft")
+
+
+class TestAdaptivePeriod(unittest.TestCase):
+
+    def setUp(self):
+        """Test data with a period that falls between grid points."""
+        data = generate_test_data(days=10, freq="10s")
+        self.data = set_circadian_time(data, period="24.3h")
+        # sensor3 is a pure sine wave repeating every 8640 samples
+        sample_freq = pd.Timedelta(pd.infer_freq(self.data.index))
+        self.true_period = 8640 * sample_freq.total_seconds() / 3600
+
+    def test_single_column(self):
+        """Test adaptive mode finds the period to within a minute."""
+        result = lomb_scargle_period(self.data, subject_no=2, adaptive=True)
+        self.assertLess(abs(result["Period"] - self.true_period), 1 / 60)
+        self.assertLess(len(result["Power_values"]), 1000)
+        self.assertTrue(result["Power_values"].index.is_monotonic_increasing)
+
+    def test_batch(self):
+        """Test the batched path refines every column."""
+        result = lomb_scargle_batch(self.data, n_periods=500, adaptive=True)
+        self.assertEqual(len(result["Power_values"]), 500)
+        self.assertLess(
+            abs(result["Period"].iloc[2] - self.true_period), 1 / 60)
+        single = lomb_scargle_period(self.data, subject_no=0, adaptive=True)
+        self.assertAlmostEqual(result["Period"].iloc[0], single["Period"])
+
+    def test_batch_astropy(self):
+        """Test the astropy path refines every column."""
+        data = self.data.resample("5min").mean()
+        result = lomb_scargle_batch(data, n_periods=300, method="astropy",
+                                    adaptive=True)
+        matrix = lomb_scargle_batch(data, n_periods=300, adaptive=True)
+        np.testing.assert_allclose(result["Period"].values,
+                                   matrix["Period"].values, atol=1e-6)
+
+    def test_batch_irregular(self):
+        """Test timestamps off a regular grid are refined with astropy."""
+        data = self.data.resample("5min").mean()
+        jitter = np.random.default_rng(0).uniform(0, 10, len(data))
+        data.index = data.index + pd.to_timedelta(jitter, unit="s")
+        result = lomb_scargle_batch(data, n_periods=300, adaptive=True)
+        self.assertLess(
+            abs(result["Period"].iloc[2] - self.true_period), 1 / 60)
+
+
+class TestLombScargleWindowed(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test data using `generate_test_data`."""
+        self.data = generate_test_data(days=6, freq="10s")
+
+    def test_matches_batch(self):
+        """Test each window matches a periodogram of that slice."""
+        result = lomb_scargle_windowed(
+            self.data, window="4D", step="1D", n_periods=200)
+        self.assertEqual(result.shape, (3 * 4, 200))
+        for day in range(3):
+            start = self.data.index[0] + pd.Timedelta(days=day)
+            window = self.data.loc[start:start + pd.Timedelta("4D") -
+                                   pd.Timedelta("10s")]
+            expected = lomb_scargle_batch(window, n_periods=200)
+            np.testing.assert_allclose(
+                result.xs(start, level="window_start").values.T,
+                expected["Power_values"].values, atol=1e-8)
+
+    def test_nan_values(self):
+        """Test windows with missing samples still find the period."""
+        data = self.data.copy()
+        data.iloc[100:5000, 0] = np.nan
+        result = lomb_scargle_windowed(data, window="4D", n_periods=200)
+        best_periods = result.xs("sensor1").idxmax(axis=1)
+        np.testing.assert_array_equal(np.round(best_periods), 24)
+
+    def test_invalid_window(self):
+        with self.assertRaises(ValueError):
+            lomb_scargle_windowed(self.data, window="36h", step="1D")
+        with self.assertRaises(ValueError):
+            lomb_scargle_windowed(self.data, window="10D", step="1D")
+
+
+class TestLombScargleSignificance(unittest.TestCase):
+
+    def setUp(self):
+        """Four days of 10 minute data with a rhythmic and a noise column."""
+        data = generate_test_data(days=10, freq="10s")
+        data = data.resample("10min").mean().iloc[:576]
+        data["noise"] = np.random.default_rng(0).normal(size=len(data))
+        self.data = data
+
+    def test_false_alarm_probability(self):
+        """Test rhythmic columns are significant and noise is not."""
+        result = lomb_scargle_significance(
+            self.data, n_permutations=99, n_jobs=1)
+        self.assertIn("Pmax", result)
+        self.assertIn("Period", result)
+        self.assertAlmostEqual(result["FAP"]["sensor1"], 0.01)
+        self.assertGreater(result["FAP"]["noise"], 0.05)
+
+    def test_reproducible(self):
+        """Test seeded results do not depend on the number of processes."""
+        serial = lomb_scargle_significance(
+            self.data, n_permutations=40, batch_size=15, n_jobs=1, seed=3)
+        pooled = lomb_scargle_significance(
+            self.data, n_permutations=40, batch_size=15, n_jobs=2, seed=3)
+        pd.testing.assert_series_equal(serial["FAP"], pooled["FAP"])
+
+    def test_gaps_and_nans(self):
+        """Test gaps and NaNs are left out of the permutations."""
+        data = self.data.drop(self.data.index[200:230])
+        data.iloc[:50, 0] = np.nan
+        result = lomb_scargle_significance(
+            data, n_permutations=99, n_jobs=1)
+        self.assertAlmostEqual(result["FAP"]["sensor1"], 0.01)
+        self.assertGreater(result["FAP"]["noise"], 0.05)
+
+    def test_irregular_timestamps(self):
+        """Test timestamps off a regular grid raise an error."""
+        data = self.data.copy()
+        jitter = np.random.default_rng(0).uniform(0, 60, len(data))
+        data.index = data.index + pd.to_timedelta(jitter, unit="s")
+        with self.assertRaises(ValueError):
+            lomb_scargle_significance(data, n_permutations=9, n_jobs=1)
+
+
+class TestAutocorrelationPeriod(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test data with an added noise column."""
+        self.data = generate_test_data(days=10, freq="10s")
+        self.data["noise"] = np.random.default_rng(0).normal(
+            size=len(self.data))
+
+    def test_valid_input(self):
+        """Test rhythmic columns peak at 24 hours with a high index."""
+        result = autocorrelation_period(self.data)
+        self.assertIn("RI", result)
+        self.assertIn("Period", result)
+        self.assertIn("ACF", result)
+        self.assertAlmostEqual(result["Period"]["sensor3"], 24, places=2)
+        self.assertGreater(result["RI"]["sensor3"], 0.5)
+        self.assertLess(result["RI"]["noise"], 0.1)
+
+    def test_matches_direct_correlation(self):
+        """Test the FFT autocorrelation against np.correlate."""
+        data = self.data.resample("1h").mean()
+        result = autocorrelation_period(data)
+        x = data["sensor1"].values - data["sensor1"].values.mean()
+        direct = np.correlate(x, x, mode="full")[len(x) - 1:]
+        direct = direct[:len(result["ACF"])] / direct[0]
+        np.testing.assert_allclose(
+            result["ACF"]["sensor1"].values, direct, atol=1e-10)
+
+    def test_invalid_period_range(self):
+        """Test with low_period >= high_period."""
+        with self.assertRaises(ValueError):
+            autocorrelation_period(self.data, low_period=30, high_period=20)
+
+
+class TestPeriodogramCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up hourly test data and turn the cache on."""
+        self.data = generate_test_data(days=10, freq="10s").resample(
+            "1h").mean()
+        enable_cache(maxsize=2)
+
+    def tearDown(self):
+        disable_cache()
+
+    def test_repeated_call_uses_cache(self):
+        """Test the periodogram is only computed once for the same data."""
+        with mock.patch.object(periodogram, "_ls_power",
+                               wraps=periodogram._ls_power) as power:
+            first = lomb_scargle_batch(self.data, n_periods=100)
+            second = lomb_scargle_batch(self.data.copy(), n_periods=100)
+        self.assertEqual(power.call_count, 1)
+        pd.testing.assert_frame_equal(
+            first["Power_values"], second["Power_values"])
+
+    def test_results_are_copies(self):
+        """Test changing a returned result leaves the cache untouched."""
+        first = lomb_scargle_batch(self.data, n_periods=100)
+        first["Pmax"][:] = -1
+        second = lomb_scargle_batch(self.data, n_periods=100)
+        self.assertTrue((second["Pmax"] > 0).all())
+
+    def test_key_depends_on_data_and_arguments(self):
+        """Test changed data or arguments are not served from the cache."""
+        result = lomb_scargle_batch(self.data, n_periods=100)
+        other = lomb_scargle_batch(self.data, n_periods=100, low_period=22)
+        changed = self.data.copy()
+        changed.iloc[0, 0] += 1
+        changed_result = lomb_scargle_batch(changed, n_periods=100)
+        self.assertNotEqual(result["Power_values"].index[0],
+                            other["Power_values"].index[0])
+        self.assertNotEqual(result["Power_values"].iloc[0, 0],
+                            changed_result["Power_values"].iloc[0, 0])
+        # least recently used entry is dropped
+        self.assertEqual(len(periodogram._CACHE["entries"]), 2)
+
+    def test_disk_cache(self):
+        """Test results are reused from disk after the memory is cleared."""
+        with tempfile.TemporaryDirectory() as directory:
+            enable_cache(maxsize=2, directory=directory)
+            first = autocorrelation_period(self.data)
+            self.assertEqual(len(os.listdir(directory)), 1)
+            disable_cache()
+            enable_cache(maxsize=2, directory=directory)
+            with mock.patch.object(np.fft, "rfft") as rfft:
+                second = autocorrelation_period(self.data)
+            rfft.assert_not_called()
+            pd.testing.assert_series_equal(first["RI"], second["RI"])
+
+
+class TestChiSquarePeriod(unittest.TestCase):
+
+    def setUp(self):
+        """Set up 1 minute test data using `generate_test_data`."""
+        self.data = generate_test_data(days=10, freq="10s").resample(
+            "1min").sum()
+
+    def test_valid_input(self):
+        """Test every column peaks at 24 hours above the threshold."""
+        result = chi_square_period(self.data)
+        for key in ["Pmax", "Period", "Power_values", "Threshold"]:
+            self.assertIn(key, result)
+        np.testing.assert_array_equal(np.round(result["Period"]), 24)
+        threshold = result["Threshold"].loc[result["Period"]].values
+        self.assertTrue((result["Pmax"].values > threshold).all())
+
+    def test_qp_value(self):
+        """Test Qp against folding a single period by hand."""
+        result = chi_square_period(self.data)
+        values = self.data.iloc[:, 0].values
+        n_cycles = len(values) // 1440
+        folded = values[:n_cycles * 1440]
+        bin_means = folded.reshape(n_cycles, 1440).mean(axis=0)
+        expected = (n_cycles * len(folded) *
+                    ((bin_means - folded.mean()) ** 2).sum() /
+                    ((folded - folded.mean()) ** 2).sum())
+        self.assertAlmostEqual(
+            result["Power_values"].iloc[:, 0].loc[24.0], expected)
+
+    def test_shifted_period(self):
+        """Test can detect a 20 hour period"""
+        data_circ = set_circadian_time(self.data, period="28h")
+        data_circ = data_circ.resample("1min").mean()
+        result = chi_square_period(data_circ, low_period=18, high_period=30)
+        self.assertTrue(result["Period"].iloc[0] < 21)
+
+    def test_low_period_greater_than_high_period(self):
+        with self.assertRaises(ValueError):
+            chi_square_period(self.data, low_period=30, high_period=20)
+
+
 if __name__ == "__main__":
     unittest.main()
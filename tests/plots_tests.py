@@ -10,7 +10,10 @@ from unittest.mock import patch
 sys.path.insert(
     0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 if True:  # noqa E402
-    from circaPy.plots import plot_actogram, plot_activity_profile
+    from circaPy.plots import plot_actogram, plot_activity_profile, \
+        plot_actogram_raster, plot_actogram_cohort, _double_plot_matrix, \
+        _minmax_decimate
+    from matplotlib.collections import PolyCollection
     from circaPy.preprocessing import set_circadian_time
     from tests.activity_tests import assign_values, generate_test_data
 
@@ -152,6 +155,146 @@ class TestPlotActogram(unittest.TestCase):
             "Number of axes does not match expected number of days.")
 
 
+class TestPlotActogramRaster(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up test data for all tests."""
+        cls.test_data = generate_test_data().resample("1min").mean()
+
+    def tearDown(self):
+        plt.close("all")
+
+    def test_double_plot_matrix(self):
+        """Test each row holds the previous and current day."""
+        data = self.test_data.iloc[:, 0]
+        matrix, days, bins = _double_plot_matrix(data)
+        n_days = len(data.index.normalize().unique())
+        self.assertEqual(bins, 1440)
+        self.assertEqual(matrix.shape, (n_days + 1, 2 * bins))
+        self.assertTrue(np.isnan(matrix[0, :bins]).all())
+        self.assertTrue(np.isnan(matrix[-1, bins:]).all())
+        np.testing.assert_array_equal(matrix[1, :bins], data.values[:bins])
+        np.testing.assert_array_equal(
+            matrix[1, bins:], data.values[bins:2 * bins])
+
+    def test_single_axes(self):
+        """Test the actogram is drawn on one Axes with one collection."""
+        fig, ax, params_dict = plot_actogram_raster(self.test_data)
+        self.assertIsInstance(ax, plt.Axes)
+        collections = [coll for coll in ax.collections
+                       if isinstance(coll, PolyCollection)]
+        self.assertEqual(len(collections), 1)
+        n_days = len(self.test_data.index.normalize().unique())
+        self.assertEqual(len(collections[0].get_paths()), n_days + 1)
+        self.assertEqual(len(fig.axes), 1)
+        self.assertEqual(params_dict["ylabel"], "Days")
+
+    def test_image_style(self):
+        """Test the heat map style draws images only."""
+        fig, ax, params_dict = plot_actogram_raster(
+            self.test_data, style="image")
+        self.assertEqual(len(ax.images), 2)
+        self.assertEqual(len(ax.collections), 0)
+        with self.assertRaises(ValueError):
+            plot_actogram_raster(self.test_data, style="unknown")
+
+    def test_subplotting(self):
+        """Test that can plot on a given Axes."""
+        fig, ax = plt.subplots(ncols=2)
+        fig, ax_out, params_dict = plot_actogram_raster(
+            self.test_data, fig=fig, subplot=ax[1])
+        self.assertIs(ax_out, ax[1])
+
+    def test_non_24hr_day(self):
+        """Tests can handle non-24 hour days"""
+        data_twenty = set_circadian_time(self.test_data, period="20h")
+        fig, ax, params_dict = plot_actogram_raster(data_twenty)
+        self.assertIsInstance(ax, plt.Axes)
+
+
+class TestPlotActogramCohort(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up test data for all tests."""
+        cls.test_data = generate_test_data().resample("1min").mean()
+
+    def tearDown(self):
+        plt.close("all")
+
+    def test_one_axes_per_subject(self):
+        """Test every subject gets an Axes matching its raster plot."""
+        fig, ax, params_dict = plot_actogram_cohort(self.test_data, ncols=2)
+        n_subjects = self.test_data.shape[1] - 1
+        self.assertEqual(len(ax), n_subjects)
+        self.assertEqual(len(fig.axes), 2 * int(np.ceil(n_subjects / 2)))
+        for subject, axis in enumerate(ax):
+            self.assertEqual(axis.get_title(), self.test_data.columns[subject])
+            _, single, _ = plot_actogram_raster(
+                self.test_data, subject_no=subject)
+            np.testing.assert_array_equal(
+                axis.collections[0].get_paths()[5].vertices,
+                single.collections[0].get_paths()[5].vertices)
+            np.testing.assert_array_equal(
+                axis.images[0].get_array(), single.images[0].get_array())
+
+    def test_subject_page(self):
+        """Test a page of subjects is plotted and the rest hidden."""
+        fig, ax, params_dict = plot_actogram_cohort(
+            self.test_data, subject_nos=[1], ncols=3)
+        self.assertEqual(len(ax), 1)
+        self.assertEqual(ax[0].get_title(), self.test_data.columns[1])
+        self.assertEqual(sum(axis.get_visible() for axis in fig.axes), 1)
+
+    def test_empty_data(self):
+        """Test empty data raises an error."""
+        with self.assertRaises(ValueError):
+            plot_actogram_cohort(self.test_data.iloc[:0])
+
+
+class TestMinMaxDecimate(unittest.TestCase):
+
+    def setUp(self):
+        self.test_data = generate_test_data(days=3)
+
+    def tearDown(self):
+        plt.close("all")
+
+    def test_envelope(self):
+        """Test each bin keeps its minimum and maximum."""
+        y = np.random.default_rng(0).normal(size=1000)
+        y[10:20] = np.nan
+        x, y_out = _minmax_decimate(np.arange(1000), y, 100)
+        self.assertEqual(len(x), 200)
+        np.testing.assert_array_equal(x[::2], np.arange(0, 1000, 10))
+        np.testing.assert_array_equal(y_out[0::2][:1], [np.nanmin(y[:10])])
+        np.testing.assert_array_equal(y_out[1::2][5], np.max(y[50:60]))
+        self.assertTrue(np.isnan(y_out[2:4]).all())
+
+    def test_short_trace_unchanged(self):
+        """Test traces with few points per bin are not changed."""
+        x, y = _minmax_decimate(np.arange(10), np.arange(10.0), 100)
+        np.testing.assert_array_equal(y, np.arange(10.0))
+
+    def test_actogram_auto(self):
+        """Test rows are decimated to the pixel width automatically."""
+        fig, ax, params_dict = plot_actogram(self.test_data)
+        n_points = len(ax[1].lines[0].get_xdata())
+        width = ax[1].get_window_extent().width
+        self.assertLessEqual(n_points, 2 * int(width))
+        fig, ax, params_dict = plot_actogram(self.test_data, decimate=False)
+        self.assertEqual(len(ax[1].lines[0].get_xdata()), 2 * 8640)
+
+    def test_activity_profile_auto(self):
+        """Test the profile is decimated only when dense."""
+        fig, ax, params = plot_activity_profile(self.test_data)
+        self.assertLess(len(ax.lines[0].get_xdata()), 8640)
+        fig, ax, params = plot_activity_profile(
+            self.test_data, resample=True)
+        self.assertEqual(len(ax.lines[0].get_xdata()), 24)
+        with self.assertRaises(ValueError):
+            plot_activity_profile(self.test_data, decimate="always")
+
+
 class TestPlotActivityProfile(unittest.TestCase):
 
     def setUp(self):
@@ -0,0 +1,398 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+if True:  # noqa E402
+    from circaPy.sleep_process import sleep_process, score_windows, \
+        unpack_scores, cole_kripke, sadeh, webster_rescore, \
+        create_scored_df, score_directory, sleep_summary, \
+        StreamingSleepScorer, _score_active_times
+
+
+def generate_sparse_activity(days=2, freq="10s", seed=0):
+    """
+    Generate activity with long runs of zeros for sleep scoring.
+
+    Returns
+    -------
+    pd.DataFrame
+        Three activity columns, mostly zero with occasional counts, and a
+        few missing epochs in the first column.
+    """
+    index = pd.date_range("2000-01-01", periods=8640 * days, freq=freq)
+    rng = np.random.default_rng(seed)
+    values = rng.poisson(3, (len(index), 3)) * (rng.random(
+        (len(index), 3)) < 0.15)
+    data = pd.DataFrame(values.astype(float), index=index,
+                        columns=["sensor1", "sensor2", "sensor3"])
+    data.iloc[100:110, 0] = np.nan
+    return data
+
+
+class TestScoreWindows(unittest.TestCase):
+
+    def setUp(self):
+        self.data = generate_sparse_activity()
+
+    def test_matches_sleep_process(self):
+        """Test every window matches scoring it with `sleep_process`."""
+        result = score_windows(self.data, windows=(4, 8, 12))
+        for window in (4, 8, 12):
+            expected = sleep_process(self.data, window=window)
+            np.testing.assert_array_equal(
+                result[window].values, expected.values)
+
+    def test_output_structure(self):
+        """Test scores are int8 with window and subject columns."""
+        result = score_windows(self.data)
+        self.assertTrue((result.dtypes == np.int8).all())
+        self.assertEqual(list(result.columns.names), ["window", "subject"])
+        self.assertEqual(result.shape, (len(self.data), 9))
+
+    def test_packbits_round_trip(self):
+        """Test packed scores unpack to the int8 scores."""
+        packed = score_windows(self.data, packbits=True)
+        self.assertEqual(packed["Packed"].shape,
+                         (int(np.ceil(len(self.data) / 8)), 9))
+        pd.testing.assert_frame_equal(
+            unpack_scores(packed), score_windows(self.data))
+
+    def test_window_longer_than_data(self):
+        """Test a window longer than the data scores nothing as sleep."""
+        result = score_windows(self.data.iloc[:5], windows=(4, 8))
+        self.assertEqual(result[8].values.sum(), 0)
+
+
+def minute_activity(days=2, seed=1):
+    """
+    Generate 1 minute activity counts alternating between active and quiet
+    bouts of random length.
+    """
+    index = pd.date_range("2000-01-01", periods=1440 * days, freq="1min")
+    rng = np.random.default_rng(seed)
+    values = np.empty((len(index), 2))
+    for col in range(2):
+        pos, active = 0, True
+        while pos < len(index):
+            length = rng.integers(1, 40)
+            scale = 150 if active else 3
+            values[pos:pos + length, col] = rng.poisson(scale, length)[
+                :len(index) - pos]
+            pos += length
+            active = not active
+    return pd.DataFrame(values, index=index, columns=["sensor1", "sensor2"])
+
+
+def webster_reference(scores):
+    """Rescores one column of sleep scores epoch by epoch."""
+    scores = list(scores)
+    result = scores.copy()
+    n = len(scores)
+    pos = 0
+    while pos < n:
+        end = pos
+        while end < n and scores[end] == scores[pos]:
+            end += 1
+        if scores[pos] == 0:
+            length = end - pos
+            extra = 4 if length >= 15 else 3 if length >= 10 else \
+                1 if length >= 4 else 0
+            for i in range(end, min(end + extra, n)):
+                result[i] = 0
+        elif pos > 0 and end < n:
+            before = pos
+            while before > 0 and scores[before - 1] == 0:
+                before -= 1
+            after = end
+            while after < n and scores[after] == 0:
+                after += 1
+            wake_before, wake_after = pos - before, after - end
+            length = end - pos
+            if (length <= 6 and min(wake_before, wake_after) >= 10) or \
+                    (length <= 10 and min(wake_before, wake_after) >= 20):
+                for i in range(pos, end):
+                    result[i] = 0
+        pos = end
+    return np.array(result)
+
+
+class TestWeightedScorers(unittest.TestCase):
+
+    def setUp(self):
+        self.data = minute_activity()
+
+    def test_cole_kripke_matches_loop(self):
+        """Test Cole-Kripke against an epoch by epoch calculation."""
+        result = cole_kripke(self.data, rescore=False)
+        weights = [106, 54, 58, 76, 230, 74, 67]
+        values = self.data["sensor2"].values
+        expected = np.zeros(len(values), dtype=int)
+        for i in range(4, len(values) - 2):
+            expected[i] = 0.001 * np.dot(weights, values[i - 4:i + 3]) < 1
+        np.testing.assert_array_equal(result["sensor2"].values, expected)
+
+    def test_sadeh_matches_loop(self):
+        """Test Sadeh against an epoch by epoch calculation."""
+        result = sadeh(self.data)
+        values = np.minimum(self.data["sensor1"].values, 300)
+        expected = np.zeros(len(values), dtype=int)
+        for i in range(5, len(values) - 5):
+            window = values[i - 5:i + 6]
+            ps = 7.601 - 0.065 * window.mean() \
+                - 1.08 * ((window >= 50) & (window < 100)).sum() \
+                - 0.056 * values[i - 5:i + 1].std(ddof=1) \
+                - 0.703 * np.log(values[i] + 1)
+            expected[i] = ps > -4
+        np.testing.assert_array_equal(result["sensor1"].values, expected)
+
+    def test_webster_matches_loop(self):
+        """Test vectorised rescoring against a run by run loop."""
+        scores = cole_kripke(self.data, rescore=False)
+        result = webster_rescore(scores)
+        for col in scores.columns:
+            np.testing.assert_array_equal(
+                result[col].values, webster_reference(scores[col]))
+        self.assertLess(result.values.sum(), scores.values.sum())
+
+    def test_create_scored_df_scorer(self):
+        """Test named scorers plug into `create_scored_df`."""
+        data = self.data.copy()
+        data["light"] = 1
+        data["label"] = "group"
+        data = data.set_index("label", append=True).swaplevel()
+        by_name = create_scored_df(data, scorer="sadeh")
+        by_function = create_scored_df(data, scorer=sadeh)
+        pd.testing.assert_frame_equal(by_name, by_function)
+        self.assertEqual(list(by_name.columns), list(data.columns))
+        with self.assertRaises(ValueError):
+            create_scored_df(data, scorer="unknown")
+
+
+class TestScoreDirectory(unittest.TestCase):
+
+    def setUp(self):
+        """Write two labelled recordings to a temporary directory."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp.name)
+        for name, seed in [("animal_1", 1), ("animal_2", 2)]:
+            data = minute_activity(days=1, seed=seed)
+            data["light"] = 1
+            data["label"] = name
+            data = data.set_index("label", append=True).swaplevel()
+            data.to_csv(self.directory / f"{name}.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_outputs_match_create_scored_df(self):
+        """Test outputs are written next to the inputs."""
+        result = score_directory(self.directory, n_jobs=1, scorer="sadeh")
+        self.assertEqual(len(result["Scored"]), 2)
+        output = pd.read_csv(self.directory / "animal_1_sleep.csv",
+                             index_col=[0, 1], parse_dates=True)
+        data = pd.read_csv(self.directory / "animal_1.csv",
+                           index_col=[0, 1], parse_dates=True)
+        expected = create_scored_df(data, scorer="sadeh")
+        np.testing.assert_array_equal(output.values, expected.values)
+
+    def test_unchanged_files_are_skipped(self):
+        """Test a rerun only rescores changed files or settings."""
+        score_directory(self.directory, n_jobs=1)
+        rerun = score_directory(self.directory, n_jobs=1)
+        self.assertEqual(rerun["Scored"], [])
+        self.assertEqual(len(rerun["Skipped"]), 2)
+
+        data = pd.read_csv(self.directory / "animal_2.csv",
+                           index_col=[0, 1], parse_dates=True)
+        data.iloc[0, 0] += 1
+        data.to_csv(self.directory / "animal_2.csv")
+        changed = score_directory(self.directory, n_jobs=1)
+        self.assertEqual([file.name for file in changed["Scored"]],
+                         ["animal_2_sleep.csv"])
+
+        new_settings = score_directory(
+            self.directory, n_jobs=1, scorer="sadeh")
+        self.assertEqual(len(new_settings["Scored"]), 2)
+
+    def test_process_pool(self):
+        """Test the process pool gives the same files as running serially."""
+        pooled = score_directory(
+            str(self.directory / "*.csv"), n_jobs=2, manifest="pool.json")
+        self.assertEqual(len(pooled["Scored"]), 2)
+        first = (self.directory / "animal_1_sleep.csv").read_text()
+        os.remove(self.directory / "animal_1_sleep.csv")
+        score_directory(self.directory, n_jobs=1)
+        self.assertEqual(
+            (self.directory / "animal_1_sleep.csv").read_text(), first)
+
+
+class TestSleepSummary(unittest.TestCase):
+
+    def setUp(self):
+        """Score three days of activity with lights on from 06:00-18:00."""
+        data = minute_activity(days=3)
+        hours = data.index.hour
+        self.scored = sadeh(data)
+        self.scored["light"] = np.where((hours >= 6) & (hours < 18), 500, 0)
+
+    def test_matches_groupby(self):
+        """Test total sleep against a pandas groupby."""
+        result = sleep_summary(self.scored)
+        self.assertEqual(len(result), 2 * 3 * 2)
+        light = np.where(self.scored["light"] >= 150, "light", "dark")
+        expected = self.scored["sensor2"].groupby(
+            [self.scored.index.day - 1, light]).sum() * 60
+        np.testing.assert_array_equal(
+            result.loc[result["subject"] == "sensor2", "sleep"].values,
+            expected.values)
+
+    def test_bouts_and_latency(self):
+        """Test bouts and latency on a hand-made recording."""
+        index = pd.date_range("2000-01-01 16:00", periods=6, freq="1h")
+        scored = pd.DataFrame({
+            "sensor1": [1, 1, 0, 0, 1, 1],
+            "light": [500, 500, 0, 0, 0, 0],
+        }, index=index)
+        result = sleep_summary(scored).set_index(["day", "phase"])
+        self.assertEqual(result.loc[(0, "light"), "bouts"], 1)
+        self.assertEqual(result.loc[(0, "light"), "max_bout"], 7200)
+        self.assertEqual(result.loc[(0, "dark"), "sleep"], 7200)
+        self.assertEqual(result.loc[(0, "dark"), "latency"], 7200)
+        self.assertTrue(np.isnan(result.loc[(0, "light"), "latency"]))
+
+    def test_multiindex_input(self):
+        """Test the (label, time) index of `create_scored_df` output."""
+        labelled = self.scored.copy()
+        labelled.index = pd.MultiIndex.from_product(
+            [["group"], labelled.index])
+        result = sleep_summary(labelled)
+        self.assertTrue((result["label"] == "group").all())
+        pd.testing.assert_frame_equal(
+            result.drop(columns="label"), sleep_summary(self.scored))
+
+    def test_several_recordings(self):
+        """Test each label matches summarising its recording on its own."""
+        second = self.scored.iloc[:-100].copy()
+        second.index = second.index + pd.Timedelta("30D")
+        second.iloc[:, :-1] = 1
+        labelled = pd.concat(
+            [self.scored, second], keys=["first", "second"],
+            names=["recording", "time"])
+        result = sleep_summary(labelled)
+        self.assertEqual(list(result.columns[:2]), ["recording", "subject"])
+        for label, single in [("first", self.scored), ("second", second)]:
+            pd.testing.assert_frame_equal(
+                result[result["recording"] == label]
+                .drop(columns="recording").reset_index(drop=True),
+                sleep_summary(single))
+
+
+class TestStreamingSleepScorer(unittest.TestCase):
+
+    def setUp(self):
+        """Activity with quiet periods at the start and end."""
+        data = generate_sparse_activity(days=1)
+        data["light"] = 1
+        data.iloc[:300, :3] = 0
+        data.iloc[-500:, :3] = 0
+        self.data = data
+
+    def stream(self, data, cuts, window=4):
+        scorer = StreamingSleepScorer(window=window)
+        bounds = [0, *cuts, len(data)]
+        parts = [scorer.update(data.iloc[start:end])
+                 for start, end in zip(bounds[:-1], bounds[1:])]
+        return pd.concat(parts + [scorer.flush()])
+
+    def test_matches_batch_scoring(self):
+        """Test chunks of random sizes give the batch result."""
+        cuts = np.sort(np.random.default_rng(0).choice(
+            len(self.data), 50, replace=False))
+        expected = _score_active_times(self.data.copy(), drop_level=False)
+        pd.testing.assert_frame_equal(
+            self.stream(self.data, cuts), expected)
+
+    def test_window_length(self):
+        """Test a longer window matches batch scoring with that window."""
+        cuts = np.sort(np.random.default_rng(1).choice(
+            len(self.data), 50, replace=False))
+        expected = _score_active_times(
+            self.data.copy(), drop_level=False, window=8)
+        pd.testing.assert_frame_equal(
+            self.stream(self.data, cuts, window=8), expected)
+        self.assertFalse(expected.equals(
+            _score_active_times(self.data.copy(), drop_level=False)))
+
+    def test_long_quiet_period(self):
+        """Test a quiet stretch held back over many chunks is released."""
+        data = self.data.copy()
+        data.iloc[2000:6000, :3] = 0
+        expected = _score_active_times(data.copy(), drop_level=False)
+        pd.testing.assert_frame_equal(
+            self.stream(data, range(100, len(data), 100)), expected)
+
+    def test_single_epochs(self):
+        """Test epochs arriving one at a time give the batch result."""
+        data = pd.concat([self.data.iloc[:320], self.data.iloc[-40:]])
+        data.index = self.data.index[:len(data)]
+        expected = _score_active_times(data.copy(), drop_level=False)
+        pd.testing.assert_frame_equal(
+            self.stream(data, range(1, len(data))), expected)
+
+    def test_holds_back_after_last_activity(self):
+        """Test epochs after the latest activity wait for more data."""
+        scorer = StreamingSleepScorer()
+        scored = scorer.update(self.data.iloc[:-500])
+        last_active = np.flatnonzero(self.data["sensor1"].iloc[:-500] > 1)[-1]
+        self.assertEqual(len(scored), last_active)
+        self.assertEqual(len(scorer.update(self.data.iloc[-500:])), 0)
+        self.assertEqual(scorer.flush().iloc[:, :3].values.sum(), 0)
+
+    def test_no_activity(self):
+        """Test a recording without activity is scored 0 throughout."""
+        data = self.data.iloc[:200]
+        expected = _score_active_times(data.copy(), drop_level=False)
+        pd.testing.assert_frame_equal(self.stream(data, [50, 120]), expected)
+
+
+class TestScoreActiveTimes(unittest.TestCase):
+
+    def setUp(self):
+        """Three recordings indexed by animal, condition and time."""
+        frames = []
+        for seed, (animal, condition) in enumerate(
+                [("a1", "baseline"), ("a1", "disrupted"), ("a2", "baseline")]):
+            data = generate_sparse_activity(days=1, seed=seed).iloc[:3000]
+            data.iloc[:200 * (seed + 1), :] = 0
+            data.iloc[-300:, :] = 0
+            data["light"] = 1
+            data["animal"] = animal
+            data["condition"] = condition
+            frames.append(data.set_index(["animal", "condition"],
+                                         append=True))
+        self.data = pd.concat(frames).reorder_levels([1, 2, 0])
+
+    def test_groups_scored_separately(self):
+        """Test each recording matches scoring it on its own."""
+        result = _score_active_times(self.data)
+        self.assertTrue(result.index.equals(self.data.index))
+        for key, group in self.data.groupby(level=[0, 1]):
+            single = group.droplevel([0, 1])
+            expected = _score_active_times(single, drop_level=False)
+            np.testing.assert_array_equal(
+                result.loc[key].values, expected.values)
+
+    def test_input_unchanged(self):
+        """Test the light column is not removed from the input."""
+        columns = list(self.data.columns)
+        _score_active_times(self.data, scorer="sadeh")
+        self.assertEqual(list(self.data.columns), columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
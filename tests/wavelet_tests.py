@@ -0,0 +1,76 @@
+import unittest
+import sys
+import os
+import numpy as np
+import pandas as pd
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+if True:  # noqa E402
+    from circaPy.wavelet import wavelet_period
+
+
+class TestWaveletPeriod(unittest.TestCase):
+
+    def setUp(self):
+        """Forty days of 10 minute data, the period of "drift" changes from
+        24 to 26 hours halfway through."""
+        index = pd.date_range("2000-01-01", periods=40 * 144, freq="10min")
+        hours = np.arange(len(index)) / 6
+        period = np.where(hours < hours[-1] / 2, 24, 26)
+        phase = np.cumsum(2 * np.pi / period / 6)
+        noise = np.random.default_rng(0).normal(0, 1, len(index))
+        self.data = pd.DataFrame({
+            "drift": 10 + 3 * np.cos(phase),
+            "steady": 5 * np.cos(2 * np.pi * hours / 25) + noise,
+        }, index=index)
+        self.n = len(index)
+
+    def test_output_structure(self):
+        """Test each output has the data index and columns."""
+        result = wavelet_period(self.data)
+        for key in ["Period", "Amplitude", "Power"]:
+            self.assertIn(key, result)
+            self.assertEqual(result[key].shape, self.data.shape)
+            self.assertTrue(result[key].index.equals(self.data.index))
+
+    def test_tracks_period_change(self):
+        """Test the ridge follows the change in period."""
+        period = wavelet_period(self.data, n_scales=51)["Period"]["drift"]
+        n = self.n
+        self.assertAlmostEqual(
+            period.iloc[n // 8:3 * n // 8].median(), 24, delta=0.2)
+        self.assertAlmostEqual(
+            period.iloc[5 * n // 8:7 * n // 8].median(), 26, delta=0.2)
+
+    def test_amplitude(self):
+        """Test the amplitude of a steady rhythm is recovered."""
+        result = wavelet_period(self.data, n_scales=51)
+        n = self.n
+        middle = slice(n // 4, 3 * n // 4)
+        self.assertAlmostEqual(
+            result["Period"]["steady"].iloc[middle].median(), 25, delta=0.2)
+        self.assertAlmostEqual(
+            result["Amplitude"]["steady"].iloc[middle].median(), 5,
+            delta=0.2)
+
+    def test_scale_blocks(self):
+        """Test the result does not depend on the block size."""
+        small = wavelet_period(self.data, scale_block=3)
+        large = wavelet_period(self.data, scale_block=50)
+        pd.testing.assert_frame_equal(small["Period"], large["Period"])
+
+    def test_memory_limit(self):
+        """Test blocking to fit a memory limit gives the same result."""
+        limited = wavelet_period(self.data, max_memory=1)
+        full = wavelet_period(self.data)
+        for key in ["Period", "Amplitude"]:
+            pd.testing.assert_frame_equal(limited[key], full[key])
+
+    def test_invalid_period_range(self):
+        """Test with low_period >= high_period."""
+        with self.assertRaises(ValueError):
+            wavelet_period(self.data, low_period=30, high_period=20)
+
+
+if __name__ == "__main__":
+    unittest.main()